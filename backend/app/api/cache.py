@@ -0,0 +1,42 @@
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.core.local_cache import get_local_cache
+from app.core.single_flight import get_single_flight
+from app.services.search_backends import get_local_backend
+from app.services.semantic_cache import SemanticCache
+
+router = APIRouter()
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """In-process cache size, hit ratio and eviction counters for this API process."""
+    local_backend = get_local_backend()
+    return {
+        "local": get_local_cache().stats(),
+        "vectors": local_backend.stats() if local_backend is not None else None,
+        "semantic": SemanticCache.stats(),
+        "single_flight": {
+            name: get_single_flight(name).stats()
+            for name in ("answers", "embeddings")
+        },
+    }
+
+
+@router.get("/cache/semantic/audit")
+async def semantic_cache_audit(limit: int = Query(50, ge=1, le=500)):
+    """Recent semantic cache hits with the cached query each was served from, for review."""
+    return {
+        **(await SemanticCache.audit_summary()),
+        "hits": await SemanticCache.recent_hits(limit),
+    }
+
+
+@router.post("/cache/semantic/audit/{hit_id}/false-hit")
+async def report_false_hit(hit_id: UUID):
+    """Mark a hit as a wrong answer; the cached entry that served it is dropped."""
+    if not await SemanticCache.mark_false_hit(str(hit_id)):
+        raise HTTPException(404, "Semantic cache hit not found")
+    return {"id": str(hit_id), "false_hit": True}
@@ -1,19 +1,24 @@
-import io
+import asyncio
+import hashlib
 import uuid
 from pathlib import Path
 from typing import Optional
 
-import PyPDF2
-from PyPDF2.errors import PdfReadError
-from fastapi import APIRouter, BackgroundTasks, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
 
 from app.core.config import settings
 from app.core.database import database
+from app.core.local_cache import publish_document_change
 from app.models.schemas import DocumentListResponse, DocumentResponse
+from app.services import text_processing
 from app.services.document_service import DocumentService
+from app.services.job_queue import JobQueue
 
 router = APIRouter()
 
+# Uploads are copied to disk in parts of this size, never held whole in memory
+UPLOAD_PART_SIZE = 1024 * 1024
+
 
 def _document_payload(doc) -> dict:
     return {
@@ -22,76 +27,143 @@ def _document_payload(doc) -> dict:
         "page_count": doc["page_count"],
         "chunk_count": doc["chunk_count"] or 0,
         "status": doc["processing_status"],
+        "pages_processed": doc["pages_processed"],
+        "progress": round(doc["pages_processed"] / doc["page_count"], 3) if doc["page_count"] else 0.0,
         "upload_timestamp": doc["upload_timestamp"].isoformat() if doc["upload_timestamp"] else None,
     }
 
 
-def _read_pdf_page_count(content: bytes) -> int:
-    if not content.startswith(b"%PDF-"):
-        raise HTTPException(400, "The uploaded file is not a valid PDF")
+def _open_upload(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return open(path, "wb")
 
-    try:
-        reader = PyPDF2.PdfReader(io.BytesIO(content))
-        if reader.is_encrypted:
-            decrypt_result = reader.decrypt("")
-            if decrypt_result == 0:
-                raise HTTPException(400, "Encrypted PDFs are not supported")
-        return len(reader.pages)
-    except HTTPException:
-        raise
-    except (PdfReadError, ValueError, OSError) as exc:
-        raise HTTPException(400, "The uploaded file is not a readable PDF") from exc
+
+def _write_part(handle, hasher, data: bytes) -> None:
+    hasher.update(data)
+    handle.write(data)
+
+
+def _discard_upload(path: Path) -> None:
+    path.unlink(missing_ok=True)
 
 
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user_id: Optional[str] = None,
 ):
-    """Upload and process a PDF document."""
-    if file.content_type not in settings.ALLOWED_FILE_TYPES:
-        raise HTTPException(400, "Only PDF files are allowed")
-
-    content = await file.read()
-    file_size = len(content)
-    if file_size == 0:
-        raise HTTPException(400, "Uploaded file is empty")
+    """Upload and process a PDF document.
 
-    if file_size > settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024:
-        raise HTTPException(400, f"File size exceeds {settings.MAX_UPLOAD_SIZE_MB}MB limit")
+    The upload is streamed to UPLOAD_DIR and hashed in fixed-size parts, and
+    only its header and trailer are checked here; the PDF is parsed once, by
+    the ingestion worker, which also records the page count.
 
-    page_count = _read_pdf_page_count(content)
-    if page_count == 0:
-        raise HTTPException(400, "PDF has no pages")
+    By the time this runs Starlette has already spooled the multipart body to
+    a temporary file, so the size check below only bounds what is copied;
+    UploadSizeLimitMiddleware is what keeps oversized bodies out.
+    """
+    if file.content_type not in settings.ALLOWED_FILE_TYPES:
+        raise HTTPException(400, "Only PDF files are allowed")
 
+    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
     document_id = str(uuid.uuid4())
     filename = Path(file.filename or "document.pdf").name
 
-    await database.execute(
-        """
-        INSERT INTO documents (id, title, filename, file_size, page_count, user_id, processing_status)
-        VALUES (:id, :title, :filename, :file_size, :page_count, :user_id, 'processing')
-        """,
-        {
-            "id": document_id,
-            "title": filename,
-            "filename": filename,
-            "file_size": file_size,
-            "page_count": page_count,
-            "user_id": user_id,
-        },
-    )
+    # Persist the upload so any worker can (re)process it after a restart
+    file_path = DocumentService.upload_path(document_id)
+    hasher = hashlib.sha256()
+    file_size = 0
+    try:
+        handle = await asyncio.to_thread(_open_upload, file_path)
+        try:
+            while True:
+                data = await file.read(UPLOAD_PART_SIZE)
+                if not data:
+                    break
+                file_size += len(data)
+                if file_size > max_bytes:
+                    raise HTTPException(400, f"File size exceeds {settings.MAX_UPLOAD_SIZE_MB}MB limit")
+                await asyncio.to_thread(_write_part, handle, hasher, data)
+        finally:
+            await asyncio.to_thread(handle.close)
+
+        if file_size == 0:
+            raise HTTPException(400, "Uploaded file is empty")
+
+        try:
+            await asyncio.to_thread(text_processing.check_pdf_structure, str(file_path))
+        except ValueError as exc:
+            raise HTTPException(400, str(exc)) from exc
+    except BaseException:
+        await asyncio.to_thread(_discard_upload, file_path)
+        raise
 
-    background_tasks.add_task(DocumentService.process_document, content, filename, document_id)
+    content_hash = hasher.hexdigest()
+    chunk_count = None
+    try:
+        duplicate = await DocumentService.find_duplicate(content_hash)
+        # Same bytes, same page count; otherwise the worker fills it in
+        page_count = duplicate["page_count"] if duplicate else 0
+
+        async with database.transaction():
+            await database.execute(
+                """
+                INSERT INTO documents (id, title, filename, file_size, page_count, user_id, content_hash, processing_status)
+                VALUES (:id, :title, :filename, :file_size, :page_count, :user_id, :content_hash, 'processing')
+                """,
+                {
+                    "id": document_id,
+                    "title": filename,
+                    "filename": filename,
+                    "file_size": file_size,
+                    "page_count": page_count,
+                    "user_id": user_id,
+                    "content_hash": content_hash,
+                },
+            )
+            if duplicate:
+                chunk_count = await DocumentService.clone_document(str(duplicate["id"]), document_id)
+
+            if chunk_count is None:
+                await JobQueue.enqueue(document_id, str(file_path), filename)
+            else:
+                await database.execute(
+                    """
+                    UPDATE documents
+                    SET processing_status = 'completed', chunks_indexed = :chunk_count, pages_processed = page_count
+                    WHERE id = :document_id
+                    """,
+                    {"document_id": document_id, "chunk_count": chunk_count},
+                )
+    except BaseException:
+        # The document row was rolled back, so nothing refers to the file
+        await asyncio.to_thread(_discard_upload, file_path)
+        raise
 
+    if chunk_count is not None:
+        print(f"Document {document_id} is a re-upload of {duplicate['id']}; cloned {chunk_count} chunks")
+        await publish_document_change(document_id)
+        return {
+            "document_id": document_id,
+            "title": filename,
+            "page_count": page_count,
+            "chunk_count": chunk_count,
+            "status": "completed",
+            "pages_processed": page_count,
+            "progress": 1.0,
+            "message": "Document uploaded successfully. Identical content was already indexed.",
+        }
+
+    JobQueue.notify_local_workers()
     return {
         "document_id": document_id,
         "title": filename,
         "page_count": page_count,
         "chunk_count": 0,
         "status": "processing",
-        "message": "Document uploaded successfully. Processing in background.",
+        "pages_processed": 0,
+        "progress": 0.0,
+        "message": "Document uploaded successfully. Queued for processing.",
     }
 
 
@@ -103,7 +175,7 @@ async def get_document(document_id: uuid.UUID):
         """
         SELECT d.*, COUNT(c.id) AS chunk_count
         FROM documents d
-        LEFT JOIN chunks c ON d.id = c.document_id
+        LEFT JOIN chunks c ON d.id = c.document_id AND c.index_version = d.index_version
         WHERE d.id = :document_id
         GROUP BY d.id
         """,
@@ -125,7 +197,7 @@ async def list_documents(
     query = """
         SELECT d.*, COUNT(c.id) AS chunk_count
         FROM documents d
-        LEFT JOIN chunks c ON d.id = c.document_id
+        LEFT JOIN chunks c ON d.id = c.document_id AND c.index_version = d.index_version
     """
 
     params = {}
@@ -153,4 +225,6 @@ async def delete_document(document_id: uuid.UUID):
     if deleted_id is None:
         raise HTTPException(404, "Document not found")
 
+    await publish_document_change(str(deleted_id))
+    await asyncio.to_thread(DocumentService.upload_path(str(deleted_id)).unlink, missing_ok=True)
     return {"document_id": str(deleted_id), "status": "deleted"}
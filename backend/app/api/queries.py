@@ -1,8 +1,10 @@
 import json
 import time
 import uuid
+from typing import Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
 from app.core.database import database
 from app.models.schemas import QueryRequest, QueryResponse
@@ -11,44 +13,36 @@ from app.services.query_service import QueryService
 router = APIRouter()
 
 
-@router.post("/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
-    """Ask a question about uploaded documents."""
-    start_time = time.time()
-    conversation_history = None
-    conversation_id = str(request.conversation_id) if request.conversation_id else None
+async def _load_history(conversation_id: Optional[str]) -> Optional[List[Dict]]:
+    """Recent messages of an existing conversation; 404 if it does not exist."""
+    if not conversation_id:
+        return None
 
-    if conversation_id:
-        conversation = await database.fetch_one(
-            "SELECT id FROM conversations WHERE id = :id",
-            {"id": conversation_id},
-        )
-        if not conversation:
-            raise HTTPException(404, "Conversation not found")
+    conversation = await database.fetch_one(
+        "SELECT id FROM conversations WHERE id = :id",
+        {"id": conversation_id},
+    )
+    if not conversation:
+        raise HTTPException(404, "Conversation not found")
 
-        messages = await database.fetch_all(
-            """
-            SELECT role, content
-            FROM messages
-            WHERE conversation_id = :conv_id
-            ORDER BY created_at DESC
-            LIMIT 10
-            """,
-            {"conv_id": conversation_id},
-        )
-        conversation_history = [
-            {"role": msg["role"], "content": msg["content"]}
-            for msg in reversed(messages)
-        ]
-
-    document_ids = [str(document_id) for document_id in request.document_ids] if request.document_ids else None
-    result = await QueryService.answer_query(
-        query=request.query,
-        document_ids=document_ids,
-        top_k=request.top_k,
-        conversation_history=conversation_history,
+    messages = await database.fetch_all(
+        """
+        SELECT role, content
+        FROM messages
+        WHERE conversation_id = :conv_id
+        ORDER BY created_at DESC
+        LIMIT 10
+        """,
+        {"conv_id": conversation_id},
     )
+    return [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in reversed(messages)
+    ]
+
 
+async def _save_exchange(request: QueryRequest, conversation_id: Optional[str], result: Dict) -> Tuple[str, str]:
+    """Store the question and answer, creating the conversation if needed; returns (conversation_id, message_id)."""
     if not conversation_id:
         conversation_id = str(uuid.uuid4())
         await database.execute(
@@ -90,6 +84,36 @@ async def query_documents(request: QueryRequest):
             "citations": json.dumps(result["citations"]),
         },
     )
+    return conversation_id, assistant_msg_id
+
+
+def _document_ids(request: QueryRequest) -> Optional[List[str]]:
+    return [str(document_id) for document_id in request.document_ids] if request.document_ids else None
+
+
+def _sse(event: str, data: Dict) -> str:
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/query", response_model=QueryResponse)
+async def query_documents(request: QueryRequest):
+    """Ask a question about uploaded documents."""
+    start_time = time.time()
+    conversation_id = str(request.conversation_id) if request.conversation_id else None
+    conversation_history = await _load_history(conversation_id)
+
+    try:
+        result = await QueryService.answer_query(
+            query=request.query,
+            document_ids=_document_ids(request),
+            top_k=request.top_k,
+            conversation_history=conversation_history,
+        )
+    except TimeoutError:
+        raise HTTPException(504, "Answer generation timed out")
+
+    conversation_id, assistant_msg_id = await _save_exchange(request, conversation_id, result)
 
     processing_time = int((time.time() - start_time) * 1000)
 
@@ -102,3 +126,58 @@ async def query_documents(request: QueryRequest):
         "cache_hit": result["cache_hit"],
         "processing_time_ms": processing_time,
     }
+
+
+@router.post("/query/stream")
+async def stream_query(request: QueryRequest):
+    """Ask a question and receive the answer as server-sent events.
+
+    "token" events carry answer text as it is generated. A final "done" event
+    carries the fields of /query plus first_token_ms, the time to the first
+    answer text. An "error" event replaces "done" if generation fails, and
+    nothing is saved.
+    """
+    start_time = time.time()
+    conversation_id = str(request.conversation_id) if request.conversation_id else None
+    conversation_history = await _load_history(conversation_id)
+
+    async def events():
+        first_token_ms = None
+        try:
+            async for event, data in QueryService.stream_answer(
+                query=request.query,
+                document_ids=_document_ids(request),
+                top_k=request.top_k,
+                conversation_history=conversation_history,
+            ):
+                if event == "token":
+                    if first_token_ms is None:
+                        first_token_ms = int((time.time() - start_time) * 1000)
+                    yield _sse("token", {"text": data})
+                    continue
+
+                saved_conversation_id, assistant_msg_id = await _save_exchange(request, conversation_id, data)
+                yield _sse(
+                    "done",
+                    {
+                        "conversation_id": saved_conversation_id,
+                        "message_id": assistant_msg_id,
+                        "answer": data["answer"],
+                        "citations": data["citations"],
+                        "retrieved_chunks": len(data["citations"]),
+                        "cache_hit": data["cache_hit"],
+                        "first_token_ms": first_token_ms,
+                        "processing_time_ms": int((time.time() - start_time) * 1000),
+                    },
+                )
+        except TimeoutError:
+            yield _sse("error", {"detail": "Answer generation timed out"})
+        except Exception as e:
+            print(f"Streaming query failed: {e}")
+            yield _sse("error", {"detail": "Failed to generate an answer"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
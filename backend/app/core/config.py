@@ -1,7 +1,8 @@
 # backend/app/core/config.py
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from typing import List, Optional, Union
+from functools import lru_cache
+from typing import List, Literal, Optional, Union
 
 class Settings(BaseSettings):
     # App
@@ -21,7 +22,26 @@ class Settings(BaseSettings):
 
     LLM_MODEL: str = "gemini-2.0-flash-lite"
     EMBEDDING_DIMENSION: int = 768  # text-embedding-004 supports output_dimensionality
-    
+    GEMINI_API_BASE_URL: str = "https://generativelanguage.googleapis.com"
+
+    # Answer generation (app.services.llm_service)
+    LLM_MAX_CONCURRENCY: int = 64  # generations in flight per process; more wait for a slot
+    LLM_TIMEOUT: float = 60.0  # seconds per call, or per whole stream
+
+    # Embedding engine
+    EMBEDDING_BATCH_SIZE: int = 100  # texts per batchEmbedContents request (API max 100)
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # batch requests in flight
+    EMBEDDING_REQUESTS_PER_MINUTE: int = 100  # starting rate; backs off on 429
+    EMBEDDING_MAX_RETRIES: int = 5
+
+    # Outbound HTTP (shared keep-alive pool for Gemini calls)
+    HTTP_HTTP2: bool = True
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0  # seconds
+    HTTP_TIMEOUT: float = 30.0  # seconds
+    HTTP_CONNECT_TIMEOUT: float = 5.0  # seconds
+
     # Legacy OpenAI (optional, for migration)
     OPENAI_API_KEY: Optional[str] = None
     
@@ -45,17 +65,78 @@ class Settings(BaseSettings):
     ALLOWED_FILE_TYPES: List[str] = ["application/pdf"]
     UPLOAD_DIR: str = "./uploads"
     
+    # PDF processing (process pool; 0 workers = one per CPU)
+    PDF_WORKERS: int = 0
+    PDF_PAGES_PER_TASK: int = 8
+    INGEST_QUEUE_SIZE: int = 256  # chunks buffered between extraction and embedding
+    INGEST_PUBLISH_PAGES: int = 25  # partial progress invalidates cached answers at most every N pages...
+    INGEST_PUBLISH_SECONDS: float = 10.0  # ...or every N seconds, whichever comes first
+    
+    # Ingestion job queue
+    INGEST_EMBEDDED_WORKER: bool = True  # run a worker inside the API process; disable when using `python -m app.worker`
+    WORKER_CONCURRENCY: int = 2  # jobs per worker process
+    WORKER_POLL_INTERVAL: float = 2.0  # seconds
+    WORKER_SHUTDOWN_GRACE: float = 20.0  # seconds to finish running jobs before releasing them
+    JOB_LEASE_SECONDS: int = 120
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: int = 30
+    JOB_RETRY_MAX_SECONDS: int = 1800
+    
+    # Background re-indexing when chunking or embedding settings change
+    REINDEX_ENABLED: bool = True
+    REINDEX_INTERVAL: float = 60.0  # seconds between scans for out-of-date documents
+    REINDEX_MAX_IN_FLIGHT: int = 1  # re-index jobs queued or running at once, across all workers
+    REINDEX_FAILURE_COOLDOWN_SECONDS: int = 86400  # before retrying a document whose re-index failed
+    
     # Chunking
     CHUNK_SIZE: int = 500  # tokens
     CHUNK_OVERLAP: int = 50  # tokens
+    CHUNK_SNAP_TO_SENTENCE: bool = False  # end chunks at a sentence boundary in their last half
     
     # RAG
     TOP_K_CHUNKS: int = 5
+    # vector: HNSW on full float32 vectors. halfvec / binary: HNSW on a float16 / 1-bit
+    # expression (needs pgvector >= 0.7), shortlist rescored exactly on the stored vectors
+    VECTOR_INDEX_MODE: Literal["vector", "halfvec", "binary"] = "vector"
+    VECTOR_RESCORE_FACTOR: int = 10  # shortlist size as a multiple of the rows needed
+    SEARCH_EXACT_MAX_ROWS: int = 20000  # filtered searches over at most this many chunks skip HNSW
+    HNSW_ITERATIVE_SCAN: Literal["relaxed_order", "strict_order", "off"] = "relaxed_order"  # pgvector >= 0.8
+    HNSW_MAX_SCAN_TUPLES: int = 20000  # cap on rows an iterative HNSW scan visits
+    # In-process exact search (NumPy, memory-mapped per-document matrices) for narrow filters
+    LOCAL_VECTOR_SEARCH: bool = True  # no effect unless numpy is installed
+    LOCAL_VECTOR_MAX_ROWS: int = 50000  # queries filtered to documents with at most this many chunks in total
+    LOCAL_VECTOR_MAX_BYTES: int = 256 * 1024 * 1024
+    LOCAL_VECTOR_DIR: str = "./vector_cache"
     SIMILARITY_THRESHOLD: float = 0.3
+    # Hybrid retrieval: full-text search alongside vector search, fused by reciprocal rank
+    HYBRID_SEARCH: bool = True
+    HYBRID_RRF_K: int = 60
+    # Queries matching this pattern (identifiers, error codes) are looked up with
+    # full-text search alone, skipping the embedding call; vector search runs only if nothing matches
+    LEXICAL_FAST_PATH: bool = True
+    LEXICAL_FAST_PATH_PATTERN: str = r"^\s*[\w.\-/:#]*\d[\w.\-/:#]*(?:\s+[\w.\-/:#]*\d[\w.\-/:#]*){0,2}\s*$"
+    # Prompt context: chunk text tokens per answer, best chunks first; neighbouring
+    # chunks of a page are merged so their shared overlap is sent once
+    CONTEXT_TOKEN_BUDGET: int = 3000
+    CONTEXT_MERGE_CHUNKS: bool = True
     
     # Caching
-    QUERY_CACHE_TTL: int = 3600  # 1 hour
+    # Answer keys include their documents' index generation, so a document change makes them
+    # unreachable at once and the TTL only bounds how long unused entries hold Redis memory
+    QUERY_CACHE_TTL: int = 259200  # 3 days
     EMBEDDING_CACHE_TTL: int = 2592000  # 30 days
+    LOCAL_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # in-process LRU in front of Redis, per process
+    LOCAL_CACHE_TTL: int = 300  # seconds; upper bound on staleness if an invalidation is missed
+    EMBEDDING_CACHE_FORMAT: Literal["float32", "float16"] = "float32"  # or "float16": half the memory, ~3 significant digits
+    # Reuse answers to earlier queries whose embeddings are this close (cosine distance), same document scope
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_MAX_DISTANCE: float = 0.05
+    # Stampede protection: identical concurrent queries share one computation; across
+    # processes via a Redis lock held for at most this long
+    SINGLE_FLIGHT_REDIS_LOCK: bool = True
+    SINGLE_FLIGHT_LOCK_TTL: float = 30.0  # seconds
+    # Recompute popular answers before they expire (XFetch); higher refreshes earlier, 0 disables
+    CACHE_EARLY_REFRESH_BETA: float = 1.0
     
     # Rate Limiting
     RATE_LIMIT_UPLOAD: str = "5/hour"
@@ -65,4 +146,21 @@ class Settings(BaseSettings):
         env_file = ".env"
         case_sensitive = True
 
-settings = Settings()
\ No newline at end of file
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Read the environment and .env once, on first use."""
+    return Settings()
+
+
+class _LazySettings:
+    """Module-level `settings` that defers building Settings() until an attribute is read."""
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+
+settings = _LazySettings()
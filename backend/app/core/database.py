@@ -1,9 +1,73 @@
+import array
+import struct
+import sys
+from functools import lru_cache
+from typing import List, Sequence
+
 import asyncpg
 from databases import Database
 
 from app.core.config import settings
 
-database = Database(settings.DATABASE_URL)
+
+def encode_vector(values: Sequence[float]) -> bytes:
+    """pgvector binary send format: uint16 dim, uint16 unused, big-endian float4[dim]."""
+    data = array.array("f", values)
+    if sys.byteorder == "little":
+        data.byteswap()
+    return struct.pack(">HH", len(data), 0) + data.tobytes()
+
+
+def decode_vector(data: bytes) -> List[float]:
+    dim, _ = struct.unpack_from(">HH", data)
+    values = array.array("f")
+    values.frombytes(data[4:4 + 4 * dim])
+    if sys.byteorder == "little":
+        values.byteswap()
+    return values.tolist()
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Send and receive pgvector values in binary instead of ~10 KB decimal strings."""
+    try:
+        await conn.set_type_codec(
+            "vector",
+            encoder=encode_vector,
+            decoder=decode_vector,
+            format="binary",
+        )
+    except ValueError:
+        # Extension not installed yet; init_db creates it before the pool connects.
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_database() -> Database:
+    """Create the connection pool wrapper on first use, once settings are needed anyway."""
+    return Database(settings.DATABASE_URL, init=_init_connection)
+
+
+class _LazyDatabase:
+    """Module-level `database` that resolves to get_database() on attribute access."""
+
+    def __getattr__(self, name):
+        return getattr(get_database(), name)
+
+
+database = _LazyDatabase()
+
+# Text search configuration of chunks.content_tsv; queries must use the same one
+TEXT_SEARCH_CONFIG = "english"
+
+
+def vector_indexes() -> dict:
+    """HNSW index name and definition per VECTOR_INDEX_MODE; expressions must match PgvectorBackend.compact_distance."""
+    dimension = settings.EMBEDDING_DIMENSION
+    return {
+        "vector": ("idx_chunks_embedding", "embedding vector_cosine_ops"),
+        "halfvec": ("idx_chunks_embedding_halfvec", f"(embedding::halfvec({dimension})) halfvec_cosine_ops"),
+        "binary": ("idx_chunks_embedding_binary", f"(binary_quantize(embedding)::bit({dimension})) bit_hamming_ops"),
+    }
 
 
 async def init_db():
@@ -24,9 +88,15 @@ async def init_db():
                 page_count INTEGER NOT NULL DEFAULT 0,
                 upload_timestamp TIMESTAMPTZ DEFAULT NOW(),
                 processing_status VARCHAR(50) DEFAULT 'processing',
+                chunks_indexed INTEGER NOT NULL DEFAULT 0,
+                pages_processed INTEGER NOT NULL DEFAULT 0,
                 user_id VARCHAR(100),
+                content_hash CHAR(64),
+                index_version INTEGER NOT NULL DEFAULT 1,
+                index_config VARCHAR(255),
+                reindexable BOOLEAN NOT NULL DEFAULT TRUE,
                 metadata JSONB,
-                CONSTRAINT check_status CHECK (processing_status IN ('processing', 'completed', 'failed'))
+                CONSTRAINT check_status CHECK (processing_status IN ('processing', 'partial', 'completed', 'failed'))
             );
         """)
 
@@ -38,7 +108,13 @@ async def init_db():
             ALTER TABLE documents ADD COLUMN IF NOT EXISTS page_count INTEGER DEFAULT 0;
             ALTER TABLE documents ADD COLUMN IF NOT EXISTS upload_timestamp TIMESTAMPTZ;
             ALTER TABLE documents ADD COLUMN IF NOT EXISTS processing_status VARCHAR(50) DEFAULT 'processing';
+            ALTER TABLE documents ADD COLUMN IF NOT EXISTS chunks_indexed INTEGER NOT NULL DEFAULT 0;
+            ALTER TABLE documents ADD COLUMN IF NOT EXISTS pages_processed INTEGER NOT NULL DEFAULT 0;
             ALTER TABLE documents ADD COLUMN IF NOT EXISTS user_id VARCHAR(100);
+            ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+            ALTER TABLE documents ADD COLUMN IF NOT EXISTS index_version INTEGER NOT NULL DEFAULT 1;
+            ALTER TABLE documents ADD COLUMN IF NOT EXISTS index_config VARCHAR(255);
+            ALTER TABLE documents ADD COLUMN IF NOT EXISTS reindexable BOOLEAN NOT NULL DEFAULT TRUE;
             ALTER TABLE documents ADD COLUMN IF NOT EXISTS metadata JSONB;
 
             UPDATE documents
@@ -64,10 +140,12 @@ async def init_db():
                     SELECT 1 FROM pg_constraint
                     WHERE conname = 'check_status'
                     AND conrelid = 'documents'::regclass
+                    AND pg_get_constraintdef(oid) LIKE '%partial%'
                 ) THEN
+                    ALTER TABLE documents DROP CONSTRAINT IF EXISTS check_status;
                     ALTER TABLE documents
                     ADD CONSTRAINT check_status
-                    CHECK (processing_status IN ('processing', 'completed', 'failed'));
+                    CHECK (processing_status IN ('processing', 'partial', 'completed', 'failed'));
                 END IF;
             END $$;
         """)
@@ -75,6 +153,7 @@ async def init_db():
         await conn.execute("""
             CREATE INDEX IF NOT EXISTS idx_documents_user_id ON documents(user_id);
             CREATE INDEX IF NOT EXISTS idx_documents_status ON documents(processing_status);
+            CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents(content_hash);
         """)
         
         # Create chunks table with vector embeddings
@@ -88,8 +167,11 @@ async def init_db():
                 char_count INTEGER,
                 token_count INTEGER,
                 embedding vector({settings.EMBEDDING_DIMENSION}),
+                content_hash CHAR(64),
+                embedding_model VARCHAR(100),
+                index_version INTEGER NOT NULL DEFAULT 1,
                 created_at TIMESTAMPTZ DEFAULT NOW(),
-                CONSTRAINT unique_chunk_per_doc UNIQUE(document_id, chunk_index)
+                CONSTRAINT unique_chunk_per_doc UNIQUE(document_id, index_version, chunk_index)
             );
         """)
 
@@ -101,16 +183,130 @@ async def init_db():
             ALTER TABLE chunks ADD COLUMN IF NOT EXISTS char_count INTEGER;
             ALTER TABLE chunks ADD COLUMN IF NOT EXISTS token_count INTEGER;
             ALTER TABLE chunks ADD COLUMN IF NOT EXISTS embedding vector({settings.EMBEDDING_DIMENSION});
+            ALTER TABLE chunks ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+            ALTER TABLE chunks ADD COLUMN IF NOT EXISTS embedding_model VARCHAR(100);
+            ALTER TABLE chunks ADD COLUMN IF NOT EXISTS index_version INTEGER NOT NULL DEFAULT 1;
             ALTER TABLE chunks ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ DEFAULT NOW();
         """)
+
+        # Bulk writes upsert on this constraint; older schemas may lack it, or
+        # predate index versions (a re-index writes its chunk set beside the live one).
+        await conn.execute("""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_constraint
+                    WHERE conname = 'unique_chunk_per_doc'
+                    AND conrelid = 'chunks'::regclass
+                    AND pg_get_constraintdef(oid) LIKE '%index_version%'
+                ) THEN
+                    ALTER TABLE chunks DROP CONSTRAINT IF EXISTS unique_chunk_per_doc;
+                    ALTER TABLE chunks
+                    ADD CONSTRAINT unique_chunk_per_doc
+                    UNIQUE (document_id, index_version, chunk_index);
+                END IF;
+            END $$;
+        """)
+        
+        # Create the HNSW index for the configured VECTOR_INDEX_MODE and drop the
+        # others; each is large, and only one is used by semantic_search.
+        for mode, (index_name, definition) in vector_indexes().items():
+            if mode == settings.VECTOR_INDEX_MODE:
+                await conn.execute(f"""
+                    CREATE INDEX IF NOT EXISTS {index_name} ON chunks
+                    USING hnsw ({definition})
+                    WITH (m = 16, ef_construction = 64)
+                """)
+            else:
+                await conn.execute(f"DROP INDEX IF EXISTS {index_name}")
         
-        # Create HNSW index for fast vector search
+        # Full-text side of hybrid retrieval. Adding a stored generated column
+        # rewrites the table once, on the first start after upgrading.
+        await conn.execute(f"""
+            ALTER TABLE chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector
+                GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', content)) STORED;
+            CREATE INDEX IF NOT EXISTS idx_chunks_content_tsv ON chunks USING gin (content_tsv);
+        """)
+
         await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_chunks_embedding ON chunks 
-            USING hnsw (embedding vector_cosine_ops)
-            WITH (m = 16, ef_construction = 64);
-            
             CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks(document_id);
+            
+            -- Durable embedding reuse: look up vectors we already paid for by chunk text
+            CREATE INDEX IF NOT EXISTS idx_chunks_content_hash ON chunks(content_hash, embedding_model)
+                WHERE content_hash IS NOT NULL;
+        """)
+
+        # Documents completed before progress was tracked report their live chunk set
+        await conn.execute("""
+            UPDATE documents d
+            SET chunks_indexed = (
+                    SELECT COUNT(*) FROM chunks c
+                    WHERE c.document_id = d.id AND c.index_version = d.index_version
+                ),
+                pages_processed = d.page_count
+            WHERE d.processing_status = 'completed' AND d.chunks_indexed = 0
+        """)
+        
+        # Semantic answer cache (app.services.semantic_cache) and its hit audit log
+        await conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS semantic_cache (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                scope_key CHAR(64) NOT NULL,
+                document_ids UUID[],
+                query TEXT NOT NULL,
+                query_embedding vector({settings.EMBEDDING_DIMENSION}) NOT NULL,
+                answer JSONB NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                expires_at TIMESTAMPTZ NOT NULL
+            );
+
+            -- Lookups score every live entry of one scope exactly; a table-wide
+            -- HNSW scan filtered by scope afterwards missed entries of small scopes
+            CREATE INDEX IF NOT EXISTS idx_semantic_cache_scope ON semantic_cache(scope_key, expires_at);
+            DROP INDEX IF EXISTS idx_semantic_cache_embedding;
+            CREATE INDEX IF NOT EXISTS idx_semantic_cache_expires ON semantic_cache(expires_at);
+
+            CREATE TABLE IF NOT EXISTS semantic_cache_audit (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                entry_id UUID REFERENCES semantic_cache(id) ON DELETE SET NULL,
+                query TEXT NOT NULL,
+                cached_query TEXT NOT NULL,
+                distance DOUBLE PRECISION NOT NULL,
+                false_hit BOOLEAN NOT NULL DEFAULT FALSE,
+                created_at TIMESTAMPTZ DEFAULT NOW()
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_semantic_cache_audit_created ON semantic_cache_audit(created_at);
+        """)
+
+        # Durable ingestion queue, consumed by app.worker
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                document_id UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                file_path TEXT NOT NULL,
+                filename VARCHAR(255) NOT NULL,
+                kind VARCHAR(20) NOT NULL DEFAULT 'ingest',
+                status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                locked_by VARCHAR(100),
+                lease_expires_at TIMESTAMPTZ,
+                last_error TEXT,
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                updated_at TIMESTAMPTZ DEFAULT NOW(),
+                CONSTRAINT check_job_status CHECK (status IN ('queued', 'running', 'completed', 'failed'))
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_runnable ON ingestion_jobs(run_after)
+                WHERE status = 'queued';
+            CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_lease ON ingestion_jobs(lease_expires_at)
+                WHERE status = 'running';
+            CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_document_id ON ingestion_jobs(document_id);
+
+            ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS kind VARCHAR(20) NOT NULL DEFAULT 'ingest';
         """)
         
         # Create conversations table
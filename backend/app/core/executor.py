@@ -0,0 +1,36 @@
+# backend/app/core/executor.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.core.config import settings
+
+process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def pdf_worker_count() -> int:
+    return settings.PDF_WORKERS or os.cpu_count() or 1
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared pool for CPU-bound PDF work, starting it on first use."""
+    global process_pool
+
+    if process_pool is None:
+        # spawn: workers must not inherit the event loop, sockets or DB pool
+        process_pool = ProcessPoolExecutor(
+            max_workers=pdf_worker_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return process_pool
+
+
+def shutdown_process_pool() -> None:
+    """Stop worker processes on shutdown."""
+    global process_pool
+
+    if process_pool is not None:
+        process_pool.shutdown(wait=True, cancel_futures=True)
+        process_pool = None
+        print("PDF process pool shut down")
@@ -0,0 +1,80 @@
+# backend/app/core/http_client.py
+from typing import Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+http_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=settings.HTTP_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.HTTP_TIMEOUT,
+            connect=settings.HTTP_CONNECT_TIMEOUT,
+        ),
+    )
+
+
+async def init_http_client() -> None:
+    """Create the shared outbound HTTP client (Gemini API)."""
+    global http_client
+
+    if http_client is None:
+        http_client = _build_client()
+        print(f"HTTP client initialized (http2={settings.HTTP_HTTP2})")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use outside the app lifespan."""
+    global http_client
+
+    if http_client is None:
+        http_client = _build_client()
+    return http_client
+
+
+async def close_http_client() -> None:
+    """Close pooled connections on shutdown."""
+    global http_client
+
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+        print("HTTP client closed")
+
+
+def http_pool_stats() -> Dict:
+    """Connection pool usage, read from the underlying httpcore pool.
+
+    httpx exposes no pool metrics, so this reads private httpx/httpcore
+    attributes (httpcore is pinned in requirements.txt for that reason). If a
+    release moves them, or the client uses another transport, the stats are
+    reported as unavailable rather than failing the health check.
+    """
+    if http_client is None:
+        return {"status": "not initialized"}
+
+    try:
+        pool = http_client._transport._pool
+        connections = list(pool.connections)
+        requests = list(pool._requests)
+        return {
+            "status": "closed" if http_client.is_closed else "open",
+            "max_connections": settings.HTTP_MAX_CONNECTIONS,
+            "connections": len(connections),
+            "idle": sum(1 for connection in connections if connection.is_idle()),
+            "active": sum(1 for connection in connections if not connection.is_idle() and not connection.is_closed()),
+            "http2": sum(1 for connection in connections if "HTTP/2" in connection.info()),
+            "requests_in_flight": sum(1 for request in requests if not request.is_queued()),
+            "requests_queued": sum(1 for request in requests if request.is_queued()),
+        }
+    except AttributeError:
+        return {"status": "unavailable"}
@@ -0,0 +1,290 @@
+# backend/app/core/local_cache.py
+"""In-process LRU cache in front of Redis for hot query embeddings and answers.
+
+Values are stored serialized (bytes or str), so the byte budget is exact and
+callers never share mutable objects. Entries carry tags; answers are tagged
+with the documents they were built from, and a document change drops them
+here and, via Redis pub/sub, in every other API process.
+
+Answers in Redis are not deleted on a change. Instead every document, and
+the corpus as a whole, has a generation in Redis that each change replaces;
+answer cache keys include the generations of their scope, so a change
+leaves the old entries unreachable until they expire. Generations are
+random rather than counters so that one evicted from Redis restarts at a
+value no cached answer was stored under.
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+from app.core.config import settings
+from app.core import redis as redis_core
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+ALL_DOCUMENTS_TAG = "documents:all"
+GLOBAL_GENERATION_KEY = "generation:all"
+# index_generation's memo holds short strings, one per document scope
+GENERATION_MEMO_MAX_BYTES = 1024 * 1024
+
+Value = Union[bytes, str]
+
+# Other per-process state derived from documents (e.g. loaded vector matrices);
+# called with a document id, or None when everything must be dropped
+_document_listeners: List[Callable[[Optional[str]], None]] = []
+
+# Shared caches derived from documents (e.g. the semantic answer cache in Postgres);
+# run once, by the process that publishes the change
+_change_hooks: List[Callable[[str], Awaitable[None]]] = []
+
+# Counts local invalidations, so a generation read that raced one is not memoised
+_invalidation_sequence = 0
+
+
+def document_tag(document_id: str) -> str:
+    return f"document:{document_id}"
+
+
+def generation_key(document_id: str) -> str:
+    return f"generation:document:{document_id}"
+
+
+def new_generation() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class LocalCache:
+    """Byte-bounded LRU with per-entry TTL and tag invalidation. Not thread-safe; use from the event loop."""
+
+    def __init__(self, max_bytes: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size, expires_at, tags)
+        self._tags: Dict[str, set] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _size(key: str, value: Value) -> int:
+        # Payload plus a rough allowance for the key and bookkeeping
+        return len(value) + len(key) + 100
+
+    def get(self, key: str) -> Optional[Value]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry[2] <= self.clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: Value, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        tags = frozenset(tags)
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (value, size, self.clock() + ttl, tags)
+        self.bytes += size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying any of `tags`; returns how many were removed."""
+        removed = 0
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                removed += 1
+        self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._tags.clear()
+        self.bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, size, _, tags = self._entries.pop(key)
+        self.bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_local_cache() -> LocalCache:
+    return LocalCache(settings.LOCAL_CACHE_MAX_BYTES, settings.LOCAL_CACHE_TTL)
+
+
+@lru_cache(maxsize=None)
+def get_generation_memo() -> LocalCache:
+    """Index generations read from Redis; separate, so the answer cache's stats count only answers."""
+    return LocalCache(GENERATION_MEMO_MAX_BYTES, settings.LOCAL_CACHE_TTL)
+
+
+def add_document_listener(listener: Callable[[Optional[str]], None]) -> None:
+    _document_listeners.append(listener)
+
+
+def add_change_hook(hook: Callable[[str], Awaitable[None]]) -> None:
+    if hook not in _change_hooks:
+        _change_hooks.append(hook)
+
+
+def invalidate_document_locally(document_id: str) -> int:
+    """Drop answers built from this document, and answers scoped to all documents."""
+    global _invalidation_sequence
+
+    _invalidation_sequence += 1
+    for listener in _document_listeners:
+        listener(document_id)
+    tags = [document_tag(document_id), ALL_DOCUMENTS_TAG]
+    get_generation_memo().invalidate_tags(tags)
+    return get_local_cache().invalidate_tags(tags)
+
+
+def invalidate_everything_locally() -> None:
+    global _invalidation_sequence
+
+    _invalidation_sequence += 1
+    for listener in _document_listeners:
+        listener(None)
+    get_generation_memo().clear()
+    get_local_cache().clear()
+
+
+async def index_generation(document_ids: Optional[Iterable[str]]) -> str:
+    """Stamp for a document scope that changes whenever a document in it changes.
+
+    None means all documents, whose stamp changes with any document. Read
+    from Redis and memoised until the next change; "" when Redis is
+    unavailable.
+    """
+    scope = sorted({str(doc_id) for doc_id in document_ids}) if document_ids else None
+    keys = [generation_key(doc_id) for doc_id in scope] if scope else [GLOBAL_GENERATION_KEY]
+    memo_key = ",".join(keys)
+    memo = get_generation_memo()
+    generation = memo.get(memo_key)
+    if generation is not None:
+        return generation
+
+    sequence = _invalidation_sequence
+
+    redis_client = await redis_core.get_redis()
+    if redis_client is None:
+        return ""
+    try:
+        values = await redis_client.mget(keys)
+        if None in values:
+            # Never changed, or evicted: start a fresh generation
+            pipe = redis_client.pipeline()
+            for key, value in zip(keys, values):
+                if value is None:
+                    pipe.set(key, new_generation(), nx=True)
+            await pipe.execute()
+            values = await redis_client.mget(keys)
+    except Exception as e:
+        print(f"Index generation lookup failed: {e}")
+        return ""
+
+    generation = ".".join(value or "" for value in values)
+    if sequence == _invalidation_sequence:
+        # Otherwise a change landed while we read, and what we read may be the old generation
+        tags = [document_tag(doc_id) for doc_id in scope] if scope else [ALL_DOCUMENTS_TAG]
+        memo.set(memo_key, generation, tags=tags)
+    return generation
+
+
+async def publish_document_change(document_id: str) -> None:
+    """Invalidate cached answers for a document in this process and, through Redis, in all others."""
+    redis_client = await redis_core.get_redis()
+    if redis_client is not None:
+        # Before dropping local state, so nothing re-reads the old generation
+        try:
+            pipe = redis_client.pipeline()
+            pipe.set(generation_key(document_id), new_generation())
+            pipe.set(GLOBAL_GENERATION_KEY, new_generation())
+            await pipe.execute()
+        except Exception as e:
+            print(f"Index generation bump failed: {e}")
+
+    invalidate_document_locally(document_id)
+    for hook in _change_hooks:
+        await hook(document_id)
+
+    if redis_client is None:
+        return
+    try:
+        await redis_client.publish(INVALIDATION_CHANNEL, str(document_id))
+    except Exception as e:
+        print(f"Cache invalidation publish failed: {e}")
+
+
+async def listen_for_invalidations(stop: asyncio.Event) -> None:
+    """Apply document changes published by other processes until `stop` is set."""
+    while not stop.is_set():
+        redis_client = await redis_core.get_redis()
+        if redis_client is None:
+            return
+
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            while not stop.is_set():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    invalidate_document_locally(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Messages may have been missed while disconnected; start from a clean slate
+            print(f"Cache invalidation listener error (local cache cleared): {e}")
+            invalidate_everything_locally()
+            await asyncio.sleep(1.0)
+        finally:
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
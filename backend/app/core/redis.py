@@ -1,12 +1,59 @@
 # backend/app/core/redis.py
+import array
+import struct
+import sys
+from typing import List, Sequence
+
 import redis.asyncio as redis
 from app.core.config import settings
 
 redis_client: redis.Redis = None
+# Same server, but returns raw bytes (for binary embedding values)
+redis_binary_client: redis.Redis = None
+
+# Embedding cache values: b"E", format byte, uint16 dim, little-endian floats[dim]
+EMBEDDING_MAGIC = b"E"
+EMBEDDING_FORMATS = {"float32": (1, "f", 4), "float16": (2, "e", 2)}
+_EMBEDDING_CODES = {code: (typecode, size) for code, typecode, size in EMBEDDING_FORMATS.values()}
+_HEADER = struct.Struct("<cBH")
+
+
+def encode_embedding(values: Sequence[float], fmt: str = "float32") -> bytes:
+    """Pack an embedding for the Redis cache; float16 halves the size again at ~3 significant digits."""
+    code, typecode, _ = EMBEDDING_FORMATS[fmt]
+    header = _HEADER.pack(EMBEDDING_MAGIC, code, len(values))
+    if typecode == "e":
+        return header + struct.pack(f"<{len(values)}e", *values)
+
+    data = array.array("f", values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return header + data.tobytes()
+
+
+def decode_embedding(data: bytes) -> List[float]:
+    """Unpack a value written by encode_embedding, whichever format it used."""
+    magic, code, dim = _HEADER.unpack_from(data)
+    if magic != EMBEDDING_MAGIC or code not in _EMBEDDING_CODES:
+        raise ValueError("Not a binary embedding value")
+
+    typecode, size = _EMBEDDING_CODES[code]
+    body = data[_HEADER.size:_HEADER.size + size * dim]
+    if len(body) != size * dim:
+        raise ValueError("Truncated binary embedding value")
+    if typecode == "e":
+        return list(struct.unpack(f"<{dim}e", body))
+
+    values = array.array("f")
+    values.frombytes(body)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
 
 async def init_redis() -> None:
-    """Initialize the global Redis client."""
-    global redis_client
+    """Initialize the global Redis clients."""
+    global redis_client, redis_binary_client
 
     try:
         # Create async Redis client from REDIS_URL env
@@ -14,6 +61,7 @@ async def init_redis() -> None:
             settings.REDIS_URL,
             decode_responses=True,
         )
+        redis_binary_client = redis.from_url(settings.REDIS_URL)
 
         # Simple connectivity check
         await redis_client.ping()
@@ -21,15 +69,25 @@ async def init_redis() -> None:
     except Exception as e:
         print(f"Redis connection failed (caching disabled): {e}")
         redis_client = None
+        redis_binary_client = None
 
 async def get_redis():
     """Dependency for Redis client - returns None if not connected"""
     return redis_client
 
 
+async def get_redis_binary():
+    """Redis client without response decoding - returns None if not connected"""
+    return redis_binary_client
+
+
 async def close_redis() -> None:
-    """Cleanly close Redis connection on shutdown."""
-    global redis_client
+    """Cleanly close Redis connections on shutdown."""
+    global redis_client, redis_binary_client
+
+    if redis_binary_client is not None:
+        await redis_binary_client.close()
+        redis_binary_client = None
 
     if redis_client is not None:
         await redis_client.close()
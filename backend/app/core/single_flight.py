@@ -0,0 +1,171 @@
+# backend/app/core/single_flight.py
+"""Coalesce identical concurrent work (cache stampede protection).
+
+Within a process, the first caller for a key leads and later callers await
+its result. Across processes, the leader also takes a short Redis lock;
+callers elsewhere that find it taken poll the shared cache for the leader's
+result instead of repeating the work, and compute it themselves only if the
+lock goes away (or times out) without a result appearing.
+"""
+import asyncio
+import uuid
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core import redis as redis_core
+
+# Delete the lock only if we still hold it (it may have expired and been retaken)
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.remote_followers = 0
+
+    def join(self, key: str) -> Optional[asyncio.Future]:
+        """The in-process flight for `key`, if one is running."""
+        return self._flights.get(key)
+
+    def begin(self, key: str) -> asyncio.Future:
+        """Register this caller as the leader for `key`; settle it with finish() or abandon()."""
+        flight = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; don't warn about an exception nobody retrieved
+        flight.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._flights[key] = flight
+        self.leaders += 1
+        return flight
+
+    def finish(self, key: str, result: Any = None, error: Optional[BaseException] = None) -> None:
+        flight = self._flights.pop(key, None)
+        if flight is None or flight.done():
+            return
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(result)
+
+    def abandon(self, key: str) -> None:
+        """The leader stopped without a result (e.g. it was cancelled); followers compute for themselves."""
+        flight = self._flights.pop(key, None)
+        if flight is not None and not flight.done():
+            flight.cancel()
+
+    async def follow(self, flight: asyncio.Future) -> Any:
+        """Await a leader's result; raises LookupError if the leader abandoned the flight."""
+        self.followers += 1
+        try:
+            return await asyncio.shield(flight)
+        except asyncio.CancelledError:
+            if flight.cancelled() and not asyncio.current_task().cancelling():
+                raise LookupError("single-flight leader abandoned the work") from None
+            raise
+
+    async def run(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        read_shared: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        """compute() once per key at a time; concurrent callers share the result.
+
+        read_shared reads the result from the shared cache that compute()
+        fills; passing it enables the cross-process Redis lock.
+        """
+        # If the leader abandons, the first follower to wake takes over and the rest join it
+        while (flight := self.join(key)) is not None:
+            try:
+                return await self.follow(flight)
+            except LookupError:
+                continue
+
+        self.begin(key)
+        try:
+            result = await self._lead(key, compute, read_shared)
+        except Exception as e:
+            self.finish(key, error=e)
+            raise
+        except BaseException:
+            self.abandon(key)
+            raise
+        self.finish(key, result)
+        return result
+
+    async def _lead(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        read_shared: Optional[Callable[[], Awaitable[Any]]],
+    ) -> Any:
+        redis_client = await redis_core.get_redis()
+        if read_shared is None or redis_client is None or not settings.SINGLE_FLIGHT_REDIS_LOCK:
+            return await compute()
+
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await redis_client.set(
+                lock_key,
+                token,
+                nx=True,
+                px=int(settings.SINGLE_FLIGHT_LOCK_TTL * 1000),
+            )
+        except Exception as e:
+            print(f"Single-flight lock unavailable ({self.name}): {e}")
+            return await compute()
+
+        if not acquired:
+            shared = await self._wait_for_shared(redis_client, lock_key, read_shared)
+            if shared is not None:
+                self.remote_followers += 1
+                return shared
+            return await compute()
+
+        try:
+            return await compute()
+        finally:
+            try:
+                await redis_client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                print(f"Single-flight lock release failed ({self.name}): {e}")
+
+    @staticmethod
+    async def _wait_for_shared(redis_client, lock_key: str, read_shared: Callable[[], Awaitable[Any]]) -> Any:
+        """Poll for another process's result while it holds the lock; None if it never appears."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.SINGLE_FLIGHT_LOCK_TTL
+        delay = 0.02
+        while loop.time() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+            result = await read_shared()
+            if result is not None:
+                return result
+            try:
+                if not await redis_client.exists(lock_key):
+                    return await read_shared()
+            except Exception:
+                return None
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "remote_followers": self.remote_followers,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_single_flight(name: str) -> SingleFlight:
+    return SingleFlight(name)
@@ -2,14 +2,22 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 import time
 
 from app.core.config import settings
 from app.core.database import database, init_db
 from app.core import redis as redis_core
-from app.api import documents, queries, conversations
+from app.core import http_client as http_core
+from app.core import local_cache
+from app.core.executor import shutdown_process_pool
+from app.api import cache, documents, queries, conversations
 from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.upload_limit import UploadSizeLimitMiddleware
+from app.services.llm_service import get_llm_client
+from app.services.semantic_cache import SemanticCache
+from app.worker import run_worker
 
 
 @asynccontextmanager
@@ -18,15 +26,35 @@ async def lifespan(app: FastAPI):
     # Startup
     await init_db()
     await redis_core.init_redis()
+    await http_core.init_http_client()
     await database.connect()
     print("Database connected")
     print("Redis initialized")
+
+    worker_stop = asyncio.Event()
+    worker_task = None
+    if settings.INGEST_EMBEDDED_WORKER:
+        worker_task = asyncio.create_task(run_worker(worker_stop))
+
+    # Document changes published from this process also drop semantic cache entries
+    local_cache.add_change_hook(SemanticCache.invalidate_document)
+
+    # Keep this process's answer cache in step with document changes made elsewhere
+    cache_stop = asyncio.Event()
+    cache_listener = asyncio.create_task(local_cache.listen_for_invalidations(cache_stop))
     
     yield
     
     # Shutdown
+    if worker_task is not None:
+        worker_stop.set()
+        await worker_task
+    cache_stop.set()
+    await cache_listener
     await database.disconnect()
     await redis_core.close_redis()
+    await http_core.close_http_client()
+    shutdown_process_pool()
     print("Shutting down...")
 
 
@@ -37,6 +65,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Oversized uploads are refused before Starlette spools the form to disk
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -53,6 +84,7 @@ app.add_middleware(RateLimitMiddleware)
 app.include_router(documents.router, prefix="/api/v1", tags=["documents"])
 app.include_router(queries.router, prefix="/api/v1", tags=["queries"])
 app.include_router(conversations.router, prefix="/api/v1", tags=["conversations"])
+app.include_router(cache.router, prefix="/api/v1", tags=["cache"])
 
 @app.get("/")
 async def root():
@@ -85,6 +117,8 @@ async def health_check():
         "status": "healthy" if db_status == "healthy" and redis_status == "healthy" else "degraded",
         "database": db_status,
         "redis": redis_status,
+        "http_pool": http_core.http_pool_stats(),
+        "llm": get_llm_client().stats(),
         "timestamp": time.time()
     }
 
@@ -7,6 +7,8 @@ from starlette.responses import JSONResponse
 from app.core.config import settings
 from app.core.redis import get_redis
 
+QUERY_PATH_ALIASES = {"/api/v1/query/stream": "/api/v1/query"}
+
 
 def _parse_limit(value: str) -> tuple[int, int]:
     count, window_name = value.split("/", 1)
@@ -26,7 +28,8 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             "/api/v1/query": _parse_limit(settings.RATE_LIMIT_QUERY),
         }
 
-        path = request.url.path
+        # Streamed and buffered queries share one budget
+        path = QUERY_PATH_ALIASES.get(request.url.path, request.url.path)
         if path in limits:
             max_requests, window = limits[path]
             allowed = await self.check_rate_limit(
@@ -0,0 +1,58 @@
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+
+UPLOAD_PATHS = {"/api/v1/upload"}
+
+# Multipart boundaries and part headers sent along with the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+def max_upload_body_bytes() -> int:
+    return settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024 + FORM_OVERHEAD_BYTES
+
+
+def upload_too_large_message() -> str:
+    return f"File size exceeds {settings.MAX_UPLOAD_SIZE_MB}MB limit"
+
+
+class UploadSizeLimitMiddleware:
+    """Turn away upload bodies over MAX_UPLOAD_SIZE_MB before the form is parsed.
+
+    Starlette spools the whole multipart body to a temporary file before the
+    endpoint runs, so the endpoint's own size check comes too late to save
+    the bandwidth or the disk. A declared Content-Length over the limit is
+    answered with 413 without reading the body; a body sent without one is
+    counted as it arrives and parsing stops at the first part past the limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        limit = max_upload_body_bytes()
+        declared = Headers(scope=scope).get("content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            response = JSONResponse({"detail": upload_too_large_message()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the form parser; FastAPI passes HTTPExceptions through as responses
+                    raise HTTPException(413, upload_too_large_message())
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -9,6 +9,8 @@ class DocumentResponse(BaseModel):
     page_count: int
     chunk_count: int
     status: str
+    pages_processed: int = 0
+    progress: float = 0.0  # share of pages indexed, 0-1; 'partial' documents are searchable
     message: Optional[str] = None
     upload_timestamp: Optional[str] = None
 
@@ -21,7 +23,8 @@ class Citation(BaseModel):
     document_title: str
     page_number: int
     text_preview: str
-    similarity_score: float
+    # None for chunks found only by full-text search, which has no cosine similarity
+    similarity_score: Optional[float] = None
 
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=1000)
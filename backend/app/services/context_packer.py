@@ -0,0 +1,131 @@
+# backend/app/services/context_packer.py
+"""Fit retrieved chunks into the prompt's token budget.
+
+Consecutive chunks of a page share CHUNK_OVERLAP tokens of text, so when
+retrieval returns neighbours, sending each in full repeats that text.
+Neighbours from the same document page (by chunk_index) are merged into a
+single source with the overlap kept once. Chunks are admitted best first
+until the budget is spent; the best chunk is always kept.
+
+Costs come from the token_count stored with each chunk, scaled by the share
+of its text that is new to the prompt, so nothing is re-encoded per query.
+"""
+from typing import Dict, List, Tuple
+
+# Shorter suffix/prefix matches are treated as coincidence, not chunk overlap
+MIN_OVERLAP_CHARS = 16
+# For chunks without a stored token_count
+CHARS_PER_TOKEN = 4
+
+
+def overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`, if at least MIN_OVERLAP_CHARS.
+
+    The shared text need not start at a word: chunk windows are cut at token
+    boundaries, which often fall inside a word.
+    """
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(probe, start + 1)
+    return 0
+
+
+def merge_texts(left: str, right: str) -> str:
+    """Join two consecutive chunks, keeping the text they share once."""
+    overlap = overlap_length(left, right)
+    if overlap:
+        return left + right[overlap:]
+    return f"{left} {right}"
+
+
+def estimate_tokens(chunk: Dict, text: str) -> int:
+    """Tokens in `text`, a part of chunk["content"]."""
+    token_count = chunk.get("token_count")
+    if not token_count or not chunk["content"]:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return -(-token_count * len(text) // len(chunk["content"]))
+
+
+def _position(chunk: Dict) -> Tuple:
+    return chunk.get("document_id"), chunk.get("page_number"), chunk.get("chunk_index")
+
+
+def pack_chunks(chunks: List[Dict], token_budget: int, merge: bool = True) -> List[Dict]:
+    """Sources for the prompt, best first, within token_budget tokens of chunk text.
+
+    `chunks` are retrieval results, best first. A merged source keeps the
+    fields of its first chunk (so citations point at where the passage
+    starts), the best similarity of its members, and their ids in chunk_ids.
+    Chunks without a chunk_index are never merged.
+    """
+    admitted: Dict[Tuple, Dict] = {}
+    kept = []
+    used = 0
+
+    for rank, chunk in enumerate(chunks):
+        mergeable = merge and chunk.get("chunk_index") is not None
+        text = chunk["content"]
+        if mergeable:
+            document_id, page_number, index = _position(chunk)
+            if (document_id, page_number, index) in admitted:
+                continue
+            before = admitted.get((document_id, page_number, index - 1))
+            after = admitted.get((document_id, page_number, index + 1))
+            # Only the text not already in the prompt counts against the budget
+            if before is not None:
+                text = text[overlap_length(before["content"], text):]
+            if after is not None:
+                text = text[:len(text) - overlap_length(text, after["content"])]
+
+        cost = estimate_tokens(chunk, text)
+        if kept and used + cost > token_budget:
+            continue
+
+        used += cost
+        kept.append((rank, chunk))
+        if mergeable:
+            admitted[_position(chunk)] = chunk
+
+    runs = []
+    pages: Dict[Tuple, List] = {}
+    for rank, chunk in kept:
+        if merge and chunk.get("chunk_index") is not None:
+            pages.setdefault(_position(chunk)[:2], []).append((rank, chunk))
+        else:
+            runs.append([(rank, chunk)])
+
+    for members in pages.values():
+        members.sort(key=lambda member: member[1]["chunk_index"])
+        run = [members[0]]
+        for member in members[1:]:
+            if member[1]["chunk_index"] == run[-1][1]["chunk_index"] + 1:
+                run.append(member)
+            else:
+                runs.append(run)
+                run = [member]
+        runs.append(run)
+
+    runs.sort(key=lambda run: min(rank for rank, _ in run))
+    return [_merge_run([chunk for _, chunk in run]) for run in runs]
+
+
+def _merge_run(chunks: List[Dict]) -> Dict:
+    if len(chunks) == 1:
+        return chunks[0]
+
+    content = chunks[0]["content"]
+    for chunk in chunks[1:]:
+        content = merge_texts(content, chunk["content"])
+    similarities = [chunk["similarity"] for chunk in chunks if chunk.get("similarity") is not None]
+    return {
+        **chunks[0],
+        "content": content,
+        "similarity": max(similarities, default=None),
+        "chunk_ids": [chunk["chunk_id"] for chunk in chunks],
+    }
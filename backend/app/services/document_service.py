@@ -1,23 +1,32 @@
 # backend/app/services/document_service.py
-import PyPDF2
-from PyPDF2.errors import PdfReadError
-import io
-import re
-import tiktoken
-from typing import List, Dict
-import hashlib
-import json
+from collections import deque
+from pathlib import Path
+from typing import List, Dict, Optional
 import asyncio
-import httpx
+import hashlib
+import struct
+import time
 
 from app.core.config import settings
 from app.core.database import database
-from app.core.redis import get_redis
-
-# Gemini REST API endpoint (v1beta supports text-embedding-004)
-_EMBED_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-embedding-001:embedContent"
+from app.core.executor import get_process_pool, pdf_worker_count
+from app.core.local_cache import publish_document_change
+from app.core.redis import decode_embedding, encode_embedding, get_redis_binary
+from app.services import text_processing
+from app.services.embedding_service import get_embedding_engine
 
-encoder = tiktoken.encoding_for_model("gpt-4")
+_CHUNK_COLUMNS = [
+    "document_id",
+    "chunk_index",
+    "content",
+    "page_number",
+    "char_count",
+    "token_count",
+    "embedding",
+    "content_hash",
+    "embedding_model",
+    "index_version",
+]
 
 
 class DocumentService:
@@ -26,71 +35,112 @@ class DocumentService:
     def _hash_text(text: str) -> str:
         """Create a SHA256 hash of the text for Redis caching keys"""
         return hashlib.sha256(text.encode("utf-8")).hexdigest()
-
+    
     @staticmethod
-    def vector_literal(values: List[float]) -> str:
-        """Format an embedding as a pgvector literal."""
-        return "[" + ",".join(str(float(value)) for value in values) + "]"
+    def upload_path(document_id: str) -> Path:
+        """Where the original PDF is kept for (re)processing"""
+        return Path(settings.UPLOAD_DIR) / f"{document_id}.pdf"
     
     @staticmethod
-    async def process_document(file_content: bytes, filename: str, document_id: str) -> Dict:
-        """Main document processing pipeline"""
+    def index_config() -> str:
+        """Everything that shapes a document's chunks and vectors; documents built with another value get re-indexed"""
+        return (
+            f"chunker={text_processing.CHUNKER_VERSION};size={settings.CHUNK_SIZE};"
+            f"overlap={settings.CHUNK_OVERLAP};snap={int(settings.CHUNK_SNAP_TO_SENTENCE)};"
+            f"model={settings.EMBEDDING_MODEL};dim={settings.EMBEDDING_DIMENSION}"
+        )
+    
+    @staticmethod
+    async def process_document(file_path: str, filename: str, document_id: str, reindex: bool = False) -> Dict:
+        """Main document processing pipeline
+        
+        Stages run concurrently, joined by bounded queues:
+        extract/clean/chunk (process pool) -> embed -> store. Each stored batch
+        commits on its own, so the document is searchable ('partial') while
+        later pages are still being indexed, and memory stays flat.
+        
+        With reindex=True the new chunk set is written under the next
+        index_version while the current one keeps serving queries, and is
+        swapped in atomically at the end. A retried re-index overwrites the
+        same version, reusing the vectors it already stored.
+        """
         
         try:
-            print(f"Starting processing for document {document_id}: {filename}")
-            
-            # Extract text from PDF
-            pages = await DocumentService.extract_text_from_pdf(file_content)
-            print(f"   Extracted {len(pages)} pages")
+            print(f"Starting {'re-indexing' if reindex else 'processing'} for document {document_id}: {filename}")
+            started = time.perf_counter()
             
-            # Clean text
-            cleaned_pages = []
-            for page in pages:
-                cleaned_text = DocumentService.clean_text(page['text'])
-                if cleaned_text.strip():  # Skip empty pages
-                    cleaned_pages.append({
-                        'page_num': page['page_num'],
-                        'text': cleaned_text
-                    })
-            print(f"   Cleaned {len(cleaned_pages)} pages with content")
+            index_version = await database.fetch_val(
+                "SELECT index_version FROM documents WHERE id = :document_id",
+                {"document_id": document_id}
+            )
+            if index_version is None:
+                raise ValueError("Document no longer exists")
             
-            # Chunk text
-            all_chunks = []
-            for page in cleaned_pages:
-                page_chunks = DocumentService.chunk_text(
-                    text=page['text'],
-                    page_num=page['page_num']
+            if reindex:
+                index_version += 1
+            else:
+                await database.execute(
+                    """
+                    UPDATE documents
+                    SET processing_status = 'processing', chunks_indexed = 0, pages_processed = 0
+                    WHERE id = :document_id
+                    """,
+                    {"document_id": document_id}
                 )
-                for chunk in page_chunks:
-                    chunk['chunk_index'] = len(all_chunks)
-                    all_chunks.append(chunk)
-            print(f"   Created {len(all_chunks)} chunks")
-            if not all_chunks:
-                raise ValueError("No extractable text was found in this PDF")
             
-            # Generate embeddings
-            print(f"   Generating embeddings with Gemini...")
-            embedded_chunks = await DocumentService.generate_embeddings_batch(all_chunks)
-            print(f"   Generated {len(embedded_chunks)} embeddings")
+            chunk_queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+            store_queue = asyncio.Queue(maxsize=settings.EMBEDDING_MAX_CONCURRENCY)
+            stages = [
+                asyncio.create_task(DocumentService._extract_stage(document_id, file_path, chunk_queue)),
+                asyncio.create_task(DocumentService._embed_stage(chunk_queue, store_queue)),
+                asyncio.create_task(DocumentService._store_stage(document_id, index_version, reindex, store_queue)),
+            ]
+            try:
+                _, _, total_chunks = await asyncio.gather(*stages)
+            except BaseException:
+                for stage in stages:
+                    stage.cancel()
+                await asyncio.gather(*stages, return_exceptions=True)
+                raise
             
-            # Store in database
-            await DocumentService.store_chunks(document_id, embedded_chunks)
-            print(f"   Stored chunks in database")
+            if not total_chunks:
+                raise ValueError("No extractable text was found in this PDF")
             
-            # Update document status
-            await database.execute(
-                """
-                UPDATE documents 
-                SET processing_status = 'completed'
-                WHERE id = :document_id
-                """,
-                {"document_id": document_id}
-            )
+            # Update document status and make this chunk set the live one
+            async with database.transaction():
+                await database.execute(
+                    """
+                    UPDATE documents 
+                    SET processing_status = 'completed',
+                        chunks_indexed = :total_chunks,
+                        pages_processed = page_count,
+                        index_version = :index_version,
+                        index_config = :index_config
+                    WHERE id = :document_id
+                    """,
+                    {
+                        "document_id": document_id,
+                        "total_chunks": total_chunks,
+                        "index_version": index_version,
+                        "index_config": DocumentService.index_config(),
+                    }
+                )
+                # Previous versions, and leftovers from an earlier attempt that produced more chunks
+                await database.execute(
+                    """
+                    DELETE FROM chunks
+                    WHERE document_id = :document_id
+                    AND (index_version <> :index_version OR chunk_index >= :total_chunks)
+                    """,
+                    {"document_id": document_id, "index_version": index_version, "total_chunks": total_chunks}
+                )
+            await publish_document_change(document_id)
             
-            print(f"Document {document_id} processing completed: {len(embedded_chunks)} chunks")
+            elapsed = time.perf_counter() - started
+            print(f"Document {document_id} processing completed: {total_chunks} chunks in {elapsed:.1f}s")
             
             return {
-                'total_chunks': len(embedded_chunks),
+                'total_chunks': total_chunks,
                 'status': 'completed'
             }
             
@@ -99,6 +149,10 @@ class DocumentService:
             import traceback
             traceback.print_exc()
             
+            if reindex:
+                # The live chunk set is untouched; the job queue retries
+                raise
+            
             # Update document status to failed
             try:
                 await database.execute(
@@ -109,226 +163,405 @@ class DocumentService:
                     """,
                     {"document_id": document_id}
                 )
+                await publish_document_change(document_id)
             except Exception:
                 pass
             
             raise
     
     @staticmethod
-    async def extract_text_from_pdf(file_content: bytes) -> List[Dict]:
-        """Extract text from PDF with page numbers"""
-        pdf_file = io.BytesIO(file_content)
+    async def _extract_stage(document_id: str, file_path: str, chunk_queue: asyncio.Queue) -> None:
+        """Feed chunks downstream in page order, keeping one page range per worker in flight
+        
+        Workers get the file path and map the PDF themselves; this is the
+        only place the document is parsed, so page_count is recorded here.
+        """
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        
+        page_count = await loop.run_in_executor(pool, text_processing.count_pages, file_path)
+        await database.execute(
+            "UPDATE documents SET page_count = :page_count WHERE id = :document_id",
+            {"document_id": document_id, "page_count": page_count}
+        )
+        ranges = deque(text_processing.split_page_ranges(page_count, settings.PDF_PAGES_PER_TASK))
+        pending = deque()
+        chunk_index = 0
+        
         try:
-            reader = PyPDF2.PdfReader(pdf_file)
-        except PdfReadError as exc:
-            raise ValueError("The uploaded file is not a readable PDF") from exc
-
-        if reader.is_encrypted:
-            try:
-                decrypt_result = reader.decrypt("")
-            except Exception as exc:
-                raise ValueError("Encrypted PDFs are not supported") from exc
-            if decrypt_result == 0:
-                raise ValueError("Encrypted PDFs are not supported")
+            while ranges or pending:
+                while ranges and len(pending) < pdf_worker_count():
+                    first_page, last_page = ranges.popleft()
+                    pending.append(loop.run_in_executor(
+                        pool,
+                        text_processing.process_page_range,
+                        file_path,
+                        first_page,
+                        last_page,
+                        settings.CHUNK_SIZE,
+                        settings.CHUNK_OVERLAP,
+                        settings.CHUNK_SNAP_TO_SENTENCE,
+                    ))
+                
+                for page in await pending.popleft():
+                    for chunk in page['chunks']:
+                        chunk['chunk_index'] = chunk_index
+                        chunk_index += 1
+                        await chunk_queue.put(chunk)
+        finally:
+            for future in pending:
+                future.cancel()
         
-        pages = []
-        for page_num, page in enumerate(reader.pages, start=1):
-            text = page.extract_text() or ""
-            pages.append({
-                'page_num': page_num,
-                'text': text
-            })
+        print(f"   Extracted {page_count} pages into {chunk_index} chunks")
+        await chunk_queue.put(None)
+    
+    @staticmethod
+    async def _embed_stage(chunk_queue: asyncio.Queue, store_queue: asyncio.Queue) -> None:
+        """Embed chunks in API-sized batches, up to EMBEDDING_MAX_CONCURRENCY at once"""
+        pending = deque()
+        done = False
+        
+        try:
+            while not done:
+                batch = []
+                while len(batch) < settings.EMBEDDING_BATCH_SIZE:
+                    chunk = await chunk_queue.get()
+                    if chunk is None:
+                        done = True
+                        break
+                    batch.append(chunk)
+                
+                if batch:
+                    pending.append(asyncio.create_task(DocumentService.generate_embeddings_batch(batch)))
+                
+                # Hand finished batches on in order; wait only when at the concurrency limit
+                while pending and (done or pending[0].done() or len(pending) >= settings.EMBEDDING_MAX_CONCURRENCY):
+                    await store_queue.put(await pending.popleft())
+        finally:
+            for task in pending:
+                task.cancel()
         
-        return pages
+        await store_queue.put(None)
     
     @staticmethod
-    def clean_text(raw_text: str) -> str:
-        """Remove noise from PDF text"""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', raw_text)
+    async def _store_stage(document_id: str, index_version: int, reindex: bool, store_queue: asyncio.Queue) -> int:
+        """Commit each embedded batch and record progress; returns chunks stored
         
-        # Remove common PDF artifacts
-        text = re.sub(r'[^\x00-\x7F]+', ' ', text)  # Remove non-ASCII
+        Publishing a change moves the document's and the corpus' generations
+        and drops unscoped semantic-cache entries, so it happens when the
+        document first turns 'partial', then at most every
+        INGEST_PUBLISH_PAGES pages or INGEST_PUBLISH_SECONDS; the completion
+        publish covers the rest.
+        """
+        stored = 0
+        published_pages = None
+        published_at = 0.0
         
-        # Remove page numbers and headers/footers (heuristic)
-        lines = text.split('\n')
-        filtered_lines = []
-        for i, line in enumerate(lines):
-            line = line.strip()
-            word_count = len(line.split())
+        while True:
+            batch = await store_queue.get()
+            if batch is None:
+                return stored
             
-            # Skip likely headers/footers
-            if word_count < 3 and i < 2:
-                continue
-            if word_count < 3 and i > len(lines) - 3:
-                continue
+            await DocumentService.store_chunks(document_id, batch, index_version)
+            stored += len(batch)
+            if reindex:
+                continue  # not visible until the swap, so no progress to report
             
-            filtered_lines.append(line)
-        
-        text = ' '.join(filtered_lines)
-        return text.strip()
+            # Pages before the last chunk's page are fully stored
+            pages_processed = batch[-1]['page_number'] - 1
+            await database.execute(
+                """
+                UPDATE documents
+                SET processing_status = 'partial',
+                    chunks_indexed = :stored,
+                    pages_processed = GREATEST(pages_processed, :pages_processed)
+                WHERE id = :document_id
+                """,
+                {
+                    "document_id": document_id,
+                    "stored": stored,
+                    "pages_processed": pages_processed,
+                }
+            )
+            
+            # Answers cached before this batch may miss its chunks
+            now = time.monotonic()
+            if (
+                published_pages is None
+                or pages_processed - published_pages >= settings.INGEST_PUBLISH_PAGES
+                or now - published_at >= settings.INGEST_PUBLISH_SECONDS
+            ):
+                await publish_document_change(document_id)
+                published_pages, published_at = pages_processed, now
+    
+    @staticmethod
+    def clean_text(raw_text: str) -> str:
+        """Remove noise from PDF text"""
+        return text_processing.clean_text(raw_text)
     
     @staticmethod
     def chunk_text(text: str, page_num: int) -> List[Dict]:
         """Split text into chunks with overlap"""
-        chars_per_token = 4
-        chunk_chars = settings.CHUNK_SIZE * chars_per_token
-        overlap_chars = settings.CHUNK_OVERLAP * chars_per_token
+        return text_processing.chunk_text(
+            text,
+            page_num,
+            settings.CHUNK_SIZE,
+            settings.CHUNK_OVERLAP,
+            settings.CHUNK_SNAP_TO_SENTENCE,
+        )
+    
+    @staticmethod
+    async def generate_embedding(text: str) -> List[float]:
+        """Generate a single document embedding via the shared embedding engine"""
+        embeddings = await get_embedding_engine().embed_texts([text])
+        return embeddings[0]
+    
+    @staticmethod
+    async def generate_embeddings_batch(chunks: List[Dict]) -> List[Dict]:
+        """Generate embeddings with caching; uncached texts go out in concurrent batches
         
-        chunks = []
-        start = 0
-        chunk_index = 0
+        Lookup order: Redis, then vectors already stored in the chunks table
+        for the same text and model, then the embedding API.
+        """
+        started = time.perf_counter()
+        texts = [chunk['text'] for chunk in chunks]
+        for chunk in chunks:
+            chunk['content_hash'] = DocumentService._hash_text(chunk['text'])
         
-        while start < len(text):
-            end = start + chunk_chars
-            chunk_text = text[start:end]
-            
-            # Don't create tiny chunks at the end
-            if len(chunk_text) < 100 and chunks:
-                chunks[-1]['text'] += ' ' + chunk_text
-                break
-            
-            token_count = len(encoder.encode(chunk_text))
-            
-            chunks.append({
-                'chunk_index': chunk_index,
-                'text': chunk_text,
-                'page_number': page_num,
-                'char_count': len(chunk_text),
-                'token_count': token_count
-            })
-            
-            start = end - overlap_chars
-            chunk_index += 1
+        # Check cache (one round trip for the batch)
+        embeddings = await DocumentService.get_cached_embeddings(texts)
+        
+        # Reuse embeddings stored for earlier documents; refill the cache with them
+        missing = [j for j, emb in enumerate(embeddings) if emb is None]
+        cache_hits = len(texts) - len(missing)
+        stored = await DocumentService.get_stored_embeddings(
+            [chunks[idx]['content_hash'] for idx in missing]
+        )
+        to_cache = []
+        for idx in missing:
+            embedding = stored.get(chunks[idx]['content_hash'])
+            if embedding is not None:
+                embeddings[idx] = embedding
+                to_cache.append((texts[idx], embedding))
+        
+        # Generate uncached embeddings
+        uncached_indices = [j for j, emb in enumerate(embeddings) if emb is None]
+        
+        if uncached_indices:
+            generated = await get_embedding_engine().embed_texts(
+                [texts[idx] for idx in uncached_indices]
+            )
+            for idx, embedding in zip(uncached_indices, generated):
+                embeddings[idx] = embedding
+                to_cache.append((texts[idx], embedding))
+        
+        await DocumentService.cache_embeddings(to_cache)
+        
+        # Add embeddings to chunks
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk['embedding'] = embedding
+        
+        elapsed = time.perf_counter() - started
+        throughput = len(chunks) / elapsed if elapsed > 0 else float(len(chunks))
+        print(
+            f"   Embedded {len(chunks)} chunks (cache {cache_hits} hit / {len(missing)} miss, "
+            f"{len(missing) - len(uncached_indices)} from stored chunks, {len(uncached_indices)} via API) "
+            f"in {elapsed:.2f}s ({throughput:.1f} chunks/sec)"
+        )
         
         return chunks
     
     @staticmethod
-    async def generate_embedding(text: str, max_retries: int = 3) -> List[float]:
-        """Generate embedding via Gemini REST API with retry logic"""
-        payload = {
-            "model": "models/text-embedding-001",
-            "content": {"parts": [{"text": text}]},
-            "taskType": "RETRIEVAL_DOCUMENT",
-            "outputDimensionality": 768, 
-        }
-        params = {"key": settings.GOOGLE_API_KEY}
+    async def get_stored_embeddings(content_hashes: List[str]) -> Dict[str, List[float]]:
+        """Fetch vectors already stored for these chunk hashes with the current model and dimension"""
+        if not content_hashes:
+            return {}
+        
+        try:
+            rows = await database.fetch_all(
+                """
+                SELECT DISTINCT ON (content_hash) content_hash, embedding
+                FROM chunks
+                WHERE content_hash = ANY(:content_hashes)
+                AND embedding_model = :embedding_model
+                AND embedding IS NOT NULL
+                AND vector_dims(embedding) = :dimension
+                """,
+                {
+                    "content_hashes": list(set(content_hashes)),
+                    "embedding_model": settings.EMBEDDING_MODEL,
+                    "dimension": settings.EMBEDDING_DIMENSION,
+                }
+            )
+        except Exception as e:
+            # Reuse is an optimisation; fall through to the API rather than fail the ingest
+            print(f"Stored embedding lookup failed: {e}")
+            return {}
+        
+        return {row["content_hash"]: list(row["embedding"]) for row in rows}
+    
+    @staticmethod
+    def _embedding_cache_key(text: str) -> str:
+        # v3: binary values (see encode_embedding); v2 JSON entries simply expire
+        model_name = settings.EMBEDDING_MODEL.replace("/", "-")
+        return f"embedding:v3:{model_name}:{settings.EMBEDDING_DIMENSION}:{DocumentService._hash_text(text)}"
+    
+    @staticmethod
+    async def get_cached_embeddings(texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up a whole batch in Redis with one MGET; None marks a miss"""
+        redis_client = await get_redis_binary()
+        if redis_client is None or not texts:
+            return [None] * len(texts)
 
-        for attempt in range(max_retries):
+        cached = await redis_client.mget([DocumentService._embedding_cache_key(text) for text in texts])
+        embeddings = []
+        for value in cached:
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        _EMBED_URL,
-                        json=payload,
-                        params=params,
-                    )
-                    if response.status_code == 429:
-                        wait_time = (2 ** attempt) * 10
-                        print(f"   Rate limited. Waiting {wait_time}s before retry {attempt + 1}/{max_retries}")
-                        await asyncio.sleep(wait_time)
-                        continue
-                    response.raise_for_status()
-                    data = response.json()
-                    values = data["embedding"]["values"]
-                    # Truncate/pad to match DB dimension
-                    dim = settings.EMBEDDING_DIMENSION
-                    if len(values) > dim:
-                        values = values[:dim]
-                    return values
-            except httpx.HTTPStatusError as e:
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(5)
-                else:
-                    raise Exception(f"Embedding API error: {e.response.status_code} {e.response.text}")
-
-        raise Exception(f"Failed to generate embedding after {max_retries} retries")
+                embeddings.append(decode_embedding(value) if value is not None else None)
+            except (ValueError, struct.error):
+                embeddings.append(None)  # corrupt entry: treat as a miss and overwrite
+        return embeddings
     
     @staticmethod
-    async def generate_embeddings_batch(chunks: List[Dict], batch_size: int = 20) -> List[Dict]:
-        """Generate embeddings with caching"""
-        results = []
-        
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i + batch_size]
-            texts = [chunk['text'] for chunk in batch]
-            
-            # Check cache
-            embeddings = []
-            for text in texts:
-                cached = await DocumentService.get_cached_embedding(text)
-                if cached:
-                    embeddings.append(cached)
-                else:
-                    embeddings.append(None)
-            
-            # Generate uncached embeddings
-            uncached_indices = [j for j, emb in enumerate(embeddings) if emb is None]
-            
-            if uncached_indices:
-                for idx in uncached_indices:
-                    text = texts[idx]
-                    # Generate embedding using Gemini
-                    embedding = await DocumentService.generate_embedding(text)
-                    embeddings[idx] = embedding
-                    # Cache embedding
-                    await DocumentService.cache_embedding(text, embedding)
-                    # Small delay to avoid rate limits (free tier: ~100 requests/minute)
-                    await asyncio.sleep(0.7)
-            
-            # Add embeddings to chunks
-            for j, chunk in enumerate(batch):
-                chunk['embedding'] = embeddings[j]
-            
-            results.extend(batch)
-        
-        return results
+    async def cache_embeddings(items: List[tuple]) -> None:
+        """Store (text, embedding) pairs with SETEX, pipelined into one round trip"""
+        redis_client = await get_redis_binary()
+        if redis_client is None or not items:
+            return
+
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for text, embedding in items:
+                pipe.setex(
+                    DocumentService._embedding_cache_key(text),
+                    settings.EMBEDDING_CACHE_TTL,
+                    encode_embedding(embedding, settings.EMBEDDING_CACHE_FORMAT)
+                )
+            await pipe.execute()
     
     @staticmethod
     async def get_cached_embedding(text: str):
         """Check Redis for cached embedding"""
-        redis_client = await get_redis()
-        if redis_client is None:
-            return None
-
-        model_name = settings.EMBEDDING_MODEL.replace("/", "-")
-        cache_key = f"embedding:v2:{model_name}:768:{DocumentService._hash_text(text)}"
-        cached = await redis_client.get(cache_key)
-        if cached is None:
-            return None
-
-        return json.loads(cached)
+        return (await DocumentService.get_cached_embeddings([text]))[0]
     
     @staticmethod
     async def cache_embedding(text: str, embedding: List[float]):
         """Store embedding in Redis cache if Redis is available"""
-        redis_client = await get_redis()
-        if redis_client is None:
+        await DocumentService.cache_embeddings([(text, embedding)])
+    
+    @staticmethod
+    async def store_chunks(document_id: str, chunks: List[Dict], index_version: int = 1):
+        """Store chunks in one transaction: binary COPY into a staging table, then upsert.
+        
+        Upserting on (document_id, index_version, chunk_index) makes a retried
+        ingest overwrite its earlier partial write instead of failing on
+        unique_chunk_per_doc.
+        """
+        if not chunks:
             return
-
-        model_name = settings.EMBEDDING_MODEL.replace("/", "-")
-        cache_key = f"embedding:v2:{model_name}:768:{DocumentService._hash_text(text)}"
-        await redis_client.setex(
-            cache_key,
-            settings.EMBEDDING_CACHE_TTL,
-            json.dumps(embedding)
+        
+        records = [
+            (
+                document_id,
+                chunk['chunk_index'],
+                chunk['text'],
+                chunk['page_number'],
+                chunk['char_count'],
+                chunk['token_count'],
+                chunk['embedding'],
+                chunk.get('content_hash') or DocumentService._hash_text(chunk['text']),
+                settings.EMBEDDING_MODEL,
+                index_version,
+            )
+            for chunk in chunks
+        ]
+        columns = ", ".join(_CHUNK_COLUMNS)
+        
+        async with database.connection() as connection:
+            async with connection.transaction():
+                raw_connection = connection.raw_connection
+                # Created once per pooled session and emptied at each commit, so batches
+                # do no catalog writes; later calls only find it already there
+                await raw_connection.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS chunk_staging (LIKE chunks INCLUDING DEFAULTS) "
+                    "ON COMMIT DELETE ROWS"
+                )
+                await raw_connection.copy_records_to_table(
+                    "chunk_staging",
+                    records=records,
+                    columns=_CHUNK_COLUMNS,
+                )
+                await raw_connection.execute(
+                    f"""
+                    INSERT INTO chunks ({columns})
+                    SELECT {columns} FROM chunk_staging
+                    ON CONFLICT ON CONSTRAINT unique_chunk_per_doc DO UPDATE SET
+                        content = EXCLUDED.content,
+                        page_number = EXCLUDED.page_number,
+                        char_count = EXCLUDED.char_count,
+                        token_count = EXCLUDED.token_count,
+                        embedding = EXCLUDED.embedding,
+                        content_hash = EXCLUDED.content_hash,
+                        embedding_model = EXCLUDED.embedding_model
+                    """
+                )
+    
+    @staticmethod
+    async def find_duplicate(content_hash: str) -> Optional[Dict]:
+        """Return the most recent completed document with identical file content, if any"""
+        row = await database.fetch_one(
+            """
+            SELECT id, page_count, chunks_indexed
+            FROM documents
+            WHERE content_hash = :content_hash AND processing_status = 'completed'
+            ORDER BY upload_timestamp DESC
+            LIMIT 1
+            """,
+            {"content_hash": content_hash}
         )
+        return dict(row) if row else None
     
     @staticmethod
-    async def store_chunks(document_id: str, chunks: List[Dict]):
-        """Store chunks in database"""
-        for chunk in chunks:
-            await database.execute(
-                """
-                INSERT INTO chunks (document_id, chunk_index, content, page_number, char_count, token_count, embedding)
-                VALUES (:document_id, :chunk_index, :content, :page_number, :char_count, :token_count, CAST(:embedding AS vector))
-                """,
-                {
-                    'document_id': document_id,
-                    'chunk_index': chunk['chunk_index'],
-                    'content': chunk['text'],
-                    'page_number': chunk['page_number'],
-                    'char_count': chunk['char_count'],
-                    'token_count': chunk['token_count'],
-                    'embedding': DocumentService.vector_literal(chunk['embedding'])
-                }
+    async def clone_document(source_id: str, document_id: str) -> Optional[int]:
+        """Copy a completed document's chunks and vectors to document_id in one INSERT ... SELECT.
+        
+        Call inside the transaction that creates document_id. Returns the number
+        of chunks copied, or None if the source is no longer a completed document.
+        """
+        # FOR SHARE keeps the source from being deleted or reprocessed mid-copy
+        source = await database.fetch_val(
+            """
+            SELECT id FROM documents
+            WHERE id = :source_id AND processing_status = 'completed'
+            FOR SHARE
+            """,
+            {"source_id": source_id}
+        )
+        if source is None:
+            return None
+        
+        # The source's live chunk set becomes version 1 of the new document
+        columns = [column for column in _CHUNK_COLUMNS if column not in ("document_id", "index_version")]
+        insert_columns = ", ".join(columns)
+        select_columns = ", ".join(f"c.{column}" for column in columns)
+        await database.execute(
+            """
+            UPDATE documents
+            SET index_config = (SELECT index_config FROM documents WHERE id = :source_id)
+            WHERE id = :document_id
+            """,
+            {"document_id": document_id, "source_id": source_id}
+        )
+        return await database.fetch_val(
+            f"""
+            WITH copied AS (
+                INSERT INTO chunks (document_id, index_version, {insert_columns})
+                SELECT :document_id, 1, {select_columns}
+                FROM chunks c
+                JOIN documents d ON d.id = c.document_id AND c.index_version = d.index_version
+                WHERE c.document_id = :source_id
+                RETURNING 1
             )
+            SELECT COUNT(*) FROM copied
+            """,
+            {"document_id": document_id, "source_id": source_id}
+        )
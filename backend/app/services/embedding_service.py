@@ -0,0 +1,263 @@
+# backend/app/services/embedding_service.py
+import asyncio
+import email.utils
+import re
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.http_client import get_http_client
+
+
+def _parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """Read the server's requested back-off from a 429 response, in seconds."""
+    header = response.headers.get("retry-after")
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                parsed = email.utils.parsedate_to_datetime(header)
+                return max(0.0, parsed.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    # Gemini reports the delay in the error body as google.rpc.RetryInfo ("12s")
+    try:
+        details = response.json().get("error", {}).get("details", [])
+    except ValueError:
+        return None
+    for detail in details:
+        match = re.fullmatch(r"([\d.]+)s", str(detail.get("retryDelay", "")))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate halves on 429s and creeps back up on success."""
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        burst: Optional[float] = None,
+        min_requests_per_minute: float = 1.0,
+    ):
+        self.max_rate = requests_per_minute / 60.0
+        self.min_rate = min(min_requests_per_minute, requests_per_minute) / 60.0
+        self.rate = self.max_rate
+        self.capacity = burst if burst is not None else max(1.0, self.max_rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until a request may be sent. Waiters are served in FIFO order."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= tokens:
+                        self.tokens -= tokens
+                        return
+                    wait = (tokens - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        """Additive increase back towards the configured rate."""
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """Multiplicative decrease, and honour Retry-After when the server sends one."""
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0.0
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+
+class EmbeddingEngine:
+    """Sends texts to Gemini's batchEmbedContents with bounded concurrency."""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        dimension: int,
+        base_url: str,
+        batch_size: int,
+        max_concurrency: int,
+        max_retries: int,
+        limiter: AdaptiveRateLimiter,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.dimension = dimension
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limiter = limiter
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._stats = {"requests": 0, "texts": 0, "rate_limited": 0, "retries": 0}
+
+    @property
+    def batch_url(self) -> str:
+        return f"{self.base_url}/v1beta/models/{self.model}:batchEmbedContents"
+
+    @property
+    def single_url(self) -> str:
+        return f"{self.base_url}/v1beta/models/{self.model}:embedContent"
+
+    def stats(self) -> Dict:
+        return dict(self._stats, current_rate_per_minute=round(self.limiter.rate * 60, 2))
+
+    async def embed_texts(
+        self,
+        texts: List[str],
+        task_type: str = "RETRIEVAL_DOCUMENT",
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> List[List[float]]:
+        """Embed texts in order, sending up to max_concurrency batches at once."""
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        client = client or get_http_client()
+        results = await asyncio.gather(
+            *(self._embed_batch(client, batch, task_type) for batch in batches)
+        )
+
+        return [values for batch_values in results for values in batch_values]
+
+    async def embed_query(
+        self,
+        text: str,
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> List[float]:
+        """Embed one query with a single embedContent call.
+
+        Queries are latency-sensitive, so they skip the ingest token bucket and
+        only feed a 429 back into it.
+        """
+        client = client or get_http_client()
+        response = await client.post(
+            self.single_url,
+            json={
+                "model": f"models/{self.model}",
+                "content": {"parts": [{"text": text}]},
+                "taskType": "RETRIEVAL_QUERY",
+                "outputDimensionality": self.dimension,
+            },
+            params={"key": self.api_key},
+        )
+        if response.status_code == 429:
+            self.limiter.on_rate_limited(_parse_retry_after(response))
+        response.raise_for_status()
+        return response.json()["embedding"]["values"][:self.dimension]
+
+    async def _embed_batch(
+        self,
+        client: httpx.AsyncClient,
+        texts: List[str],
+        task_type: str,
+    ) -> List[List[float]]:
+        payload = {
+            "requests": [
+                {
+                    "model": f"models/{self.model}",
+                    "content": {"parts": [{"text": text}]},
+                    "taskType": task_type,
+                    "outputDimensionality": self.dimension,
+                }
+                for text in texts
+            ]
+        }
+
+        last_error = "no attempts made"
+        for attempt in range(self.max_retries):
+            if attempt:
+                self._stats["retries"] += 1
+
+            await self.limiter.acquire()
+            try:
+                async with self._semaphore:
+                    self._stats["requests"] += 1
+                    response = await client.post(
+                        self.batch_url,
+                        json=payload,
+                        params={"key": self.api_key},
+                    )
+            except httpx.TransportError as exc:
+                last_error = f"{type(exc).__name__}: {exc}"
+                # Back off without holding a concurrency slot, so healthy batches keep going
+                await asyncio.sleep(min(2 ** attempt, 30))
+                continue
+
+            if response.status_code == 429:
+                self._stats["rate_limited"] += 1
+                retry_after = _parse_retry_after(response)
+                self.limiter.on_rate_limited(retry_after)
+                print(
+                    f"   Rate limited. Backing off to {self.limiter.rate * 60:.0f} req/min"
+                    f"{f' (retry after {retry_after:.0f}s)' if retry_after else ''}"
+                )
+                last_error = "429 rate limited"
+                continue
+
+            if response.status_code >= 500:
+                last_error = f"{response.status_code} {response.text}"
+                await asyncio.sleep(min(2 ** attempt, 30))
+                continue
+
+            if response.is_error:
+                raise Exception(f"Embedding API error: {response.status_code} {response.text}")
+
+            self.limiter.on_success()
+            embeddings = response.json()["embeddings"]
+            if len(embeddings) != len(texts):
+                raise Exception(
+                    f"Embedding API returned {len(embeddings)} embeddings for {len(texts)} texts"
+                )
+
+            self._stats["texts"] += len(texts)
+            # Truncate to match DB dimension
+            return [embedding["values"][:self.dimension] for embedding in embeddings]
+
+        raise Exception(
+            f"Failed to generate embeddings after {self.max_retries} retries: {last_error}"
+        )
+
+
+_engine: Optional[EmbeddingEngine] = None
+
+
+def get_embedding_engine() -> EmbeddingEngine:
+    """Return the process-wide engine so every ingest shares one rate limit."""
+    global _engine
+
+    if _engine is None:
+        _engine = EmbeddingEngine(
+            api_key=settings.GOOGLE_API_KEY,
+            model=settings.EMBEDDING_MODEL,
+            dimension=settings.EMBEDDING_DIMENSION,
+            base_url=settings.GEMINI_API_BASE_URL,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+            max_retries=settings.EMBEDDING_MAX_RETRIES,
+            limiter=AdaptiveRateLimiter(
+                requests_per_minute=settings.EMBEDDING_REQUESTS_PER_MINUTE,
+                burst=settings.EMBEDDING_MAX_CONCURRENCY,
+            ),
+        )
+    return _engine
@@ -0,0 +1,171 @@
+# backend/app/services/job_queue.py
+import asyncio
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import database
+
+# Lets a worker in the API process pick up a fresh upload without waiting for its next poll
+job_available = asyncio.Event()
+
+
+class JobQueue:
+    """Durable ingestion queue on Postgres; workers claim jobs with FOR UPDATE SKIP LOCKED."""
+
+    @staticmethod
+    async def enqueue(document_id: str, file_path: str, filename: str, kind: str = "ingest") -> str:
+        """Add a job; kind is 'ingest' or 'reindex'. Call inside the transaction that creates the document."""
+        job_id = await database.fetch_val(
+            """
+            INSERT INTO ingestion_jobs (document_id, file_path, filename, kind, max_attempts)
+            VALUES (:document_id, :file_path, :filename, :kind, :max_attempts)
+            RETURNING id
+            """,
+            {
+                "document_id": document_id,
+                "file_path": file_path,
+                "filename": filename,
+                "kind": kind,
+                "max_attempts": settings.JOB_MAX_ATTEMPTS,
+            },
+        )
+        return str(job_id)
+
+    @staticmethod
+    def notify_local_workers() -> None:
+        """Wake an embedded worker now; call after the enqueuing transaction commits."""
+        job_available.set()
+
+    @staticmethod
+    async def claim(worker_id: str, limit: int) -> List[Dict]:
+        """Lease up to `limit` runnable jobs, including ones whose previous lease expired.
+
+        New uploads go before background re-index jobs.
+        """
+        rows = await database.fetch_all(
+            """
+            UPDATE ingestion_jobs j
+            SET status = 'running',
+                attempts = j.attempts + 1,
+                locked_by = :worker_id,
+                lease_expires_at = NOW() + make_interval(secs => :lease_seconds),
+                updated_at = NOW()
+            WHERE j.id IN (
+                SELECT id FROM ingestion_jobs
+                WHERE (status = 'queued' AND run_after <= NOW())
+                OR (status = 'running' AND lease_expires_at < NOW())
+                ORDER BY kind = 'reindex', run_after
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING j.id, j.document_id, j.file_path, j.filename, j.kind, j.attempts, j.max_attempts
+            """,
+            {
+                "worker_id": worker_id,
+                "lease_seconds": float(settings.JOB_LEASE_SECONDS),
+                "limit": limit,
+            },
+        )
+        return [
+            {
+                "id": str(row["id"]),
+                "document_id": str(row["document_id"]),
+                "file_path": row["file_path"],
+                "filename": row["filename"],
+                "kind": row["kind"],
+                "attempts": row["attempts"],
+                "max_attempts": row["max_attempts"],
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    async def heartbeat(job_id: str, worker_id: str) -> bool:
+        """Extend the lease. Returns False if another worker has taken the job over."""
+        renewed = await database.fetch_val(
+            """
+            UPDATE ingestion_jobs
+            SET lease_expires_at = NOW() + make_interval(secs => :lease_seconds), updated_at = NOW()
+            WHERE id = :job_id AND locked_by = :worker_id AND status = 'running'
+            RETURNING id
+            """,
+            {
+                "job_id": job_id,
+                "worker_id": worker_id,
+                "lease_seconds": float(settings.JOB_LEASE_SECONDS),
+            },
+        )
+        return renewed is not None
+
+    @staticmethod
+    async def complete(job_id: str) -> None:
+        await database.execute(
+            """
+            UPDATE ingestion_jobs
+            SET status = 'completed', lease_expires_at = NULL, last_error = NULL, updated_at = NOW()
+            WHERE id = :job_id
+            """,
+            {"job_id": job_id},
+        )
+
+    @staticmethod
+    async def fail(job: Dict, error: str, retry: bool = True) -> Optional[float]:
+        """Record a failed attempt; schedule a retry with exponential backoff if any remain.
+
+        Returns the retry delay in seconds, or None when the job is given up.
+        """
+        if not retry or job["attempts"] >= job["max_attempts"]:
+            await database.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = 'failed', lease_expires_at = NULL, last_error = :error, updated_at = NOW()
+                WHERE id = :job_id
+                """,
+                {"job_id": job["id"], "error": error[:2000]},
+            )
+            return None
+
+        delay = min(
+            settings.JOB_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1),
+            settings.JOB_RETRY_MAX_SECONDS,
+        )
+        async with database.transaction():
+            await database.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = 'queued',
+                    locked_by = NULL,
+                    lease_expires_at = NULL,
+                    run_after = NOW() + make_interval(secs => :delay),
+                    last_error = :error,
+                    updated_at = NOW()
+                WHERE id = :job_id
+                """,
+                {"job_id": job["id"], "delay": float(delay), "error": error[:2000]},
+            )
+            if job["kind"] == "ingest":
+                # A re-index leaves the live chunk set, and the document's status, alone
+                await database.execute(
+                    "UPDATE documents SET processing_status = 'processing' WHERE id = :document_id",
+                    {"document_id": job["document_id"]},
+                )
+        return delay
+
+    @staticmethod
+    async def release(worker_id: str) -> int:
+        """Hand this worker's running jobs back to the queue on shutdown, without using up an attempt."""
+        rows = await database.fetch_all(
+            """
+            UPDATE ingestion_jobs
+            SET status = 'queued',
+                attempts = GREATEST(attempts - 1, 0),
+                locked_by = NULL,
+                lease_expires_at = NULL,
+                run_after = NOW(),
+                updated_at = NOW()
+            WHERE locked_by = :worker_id AND status = 'running'
+            RETURNING id
+            """,
+            {"worker_id": worker_id},
+        )
+        return len(rows)
@@ -0,0 +1,146 @@
+# backend/app/services/llm_service.py
+"""Gemini text generation over the shared async HTTP client.
+
+The google-genai SDK runs every call, including those made through
+``client.aio``, on a thread via ``asyncio.to_thread``; with multi-second
+generations that fills the default executor and caps concurrent answers at
+its size. Calling the REST API on the event loop instead leaves concurrency
+to LLM_MAX_CONCURRENCY and the connection pool.
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.http_client import get_http_client
+
+
+class LLMClient:
+    """Calls generateContent / streamGenerateContent with bounded concurrency and a per-call timeout."""
+
+    def __init__(self, api_key: str, model: str, base_url: str, max_concurrency: int, timeout: float):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._stats = {"requests": 0, "in_flight": 0, "waiting": 0, "timeouts": 0}
+
+    @property
+    def generate_url(self) -> str:
+        return f"{self.base_url}/v1beta/models/{self.model}:generateContent"
+
+    @property
+    def stream_url(self) -> str:
+        return f"{self.base_url}/v1beta/models/{self.model}:streamGenerateContent"
+
+    def stats(self) -> Dict:
+        return dict(self._stats, max_concurrency=self.max_concurrency)
+
+    @staticmethod
+    def build_payload(
+        contents: str,
+        system_instruction: str,
+        temperature: float,
+        max_output_tokens: int,
+        response_mime_type: Optional[str] = None,
+    ) -> Dict:
+        generation_config = {"temperature": temperature, "maxOutputTokens": max_output_tokens}
+        if response_mime_type:
+            generation_config["responseMimeType"] = response_mime_type
+        return {
+            "systemInstruction": {"parts": [{"text": system_instruction}]},
+            "contents": [{"role": "user", "parts": [{"text": contents}]}],
+            "generationConfig": generation_config,
+        }
+
+    @staticmethod
+    def response_text(body: Dict) -> str:
+        """Text of the first candidate; empty if the response was blocked or had none."""
+        candidates = body.get("candidates") or []
+        if not candidates:
+            return ""
+        parts: List[Dict] = (candidates[0].get("content") or {}).get("parts") or []
+        return "".join(part.get("text", "") for part in parts)
+
+    async def generate(self, client: Optional[httpx.AsyncClient] = None, **payload) -> str:
+        """Generate a complete response; payload is passed to build_payload."""
+        client = client or get_http_client()
+        async with self._slot():
+            async with asyncio.timeout(self.timeout):
+                response = await client.post(
+                    self.generate_url,
+                    json=self.build_payload(**payload),
+                    params={"key": self.api_key},
+                    timeout=self.timeout,
+                )
+        if response.is_error:
+            raise Exception(f"LLM API error: {response.status_code} {response.text}")
+        return self.response_text(response.json())
+
+    async def stream(self, client: Optional[httpx.AsyncClient] = None, **payload) -> AsyncIterator[str]:
+        """Yield response text as it is generated; the timeout covers the whole stream."""
+        client = client or get_http_client()
+        # A deadline rather than asyncio.timeout: the consumer runs between yields,
+        # and a timeout must not cancel it there
+        deadline = time.monotonic() + self.timeout
+        async with self._slot():
+            async with client.stream(
+                "POST",
+                self.stream_url,
+                json=self.build_payload(**payload),
+                params={"key": self.api_key, "alt": "sse"},
+                timeout=self.timeout,
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                    raise Exception(f"LLM API error: {response.status_code} {response.text}")
+
+                async for line in response.aiter_lines():
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"LLM stream exceeded {self.timeout}s")
+                    if not line.startswith("data:"):
+                        continue
+                    text = self.response_text(json.loads(line[5:]))
+                    if text:
+                        yield text
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Hold one of the max_concurrency slots for the duration of a call."""
+        self._stats["waiting"] += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._stats["waiting"] -= 1
+
+        self._stats["requests"] += 1
+        self._stats["in_flight"] += 1
+        try:
+            yield
+        except httpx.TimeoutException as e:
+            self._stats["timeouts"] += 1
+            raise TimeoutError(f"LLM call timed out: {e}") from e
+        except TimeoutError:
+            self._stats["timeouts"] += 1
+            raise
+        finally:
+            self._stats["in_flight"] -= 1
+            self._semaphore.release()
+
+
+@lru_cache(maxsize=None)
+def get_llm_client() -> LLMClient:
+    return LLMClient(
+        api_key=settings.GOOGLE_API_KEY,
+        model=settings.LLM_MODEL,
+        base_url=settings.GEMINI_API_BASE_URL,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        timeout=settings.LLM_TIMEOUT,
+    )
@@ -1,23 +1,32 @@
 import asyncio
 import hashlib
-import httpx
 import json
+import math
+import random
 import re
-from typing import Dict, List, Optional
-
-from google import genai
-from google.genai import types
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 from app.core.config import settings
-from app.core.database import database
-from app.core.redis import get_redis
-from app.services.document_service import DocumentService, _EMBED_URL
-
-# Gemini LLM client
-_llm_client = genai.Client(
-    api_key=settings.GOOGLE_API_KEY,
-    http_options={"api_version": "v1beta"},
-)
+from app.core.local_cache import ALL_DOCUMENTS_TAG, document_tag, get_local_cache, index_generation
+from app.core.redis import decode_embedding, encode_embedding, get_redis
+from app.core.single_flight import get_single_flight
+from app.services.context_packer import pack_chunks
+from app.services.document_service import DocumentService
+from app.services.embedding_service import get_embedding_engine
+from app.services.llm_service import get_llm_client
+from app.services.semantic_cache import SemanticCache
+from app.services.search_backends import get_lexical_backend, get_local_backend, get_pgvector_backend
+
+NOT_ENOUGH_INFORMATION = "I don't have enough information in the provided documents to answer this question."
+NO_CONTEXT_ANSWER = {
+    "answer": "I couldn't find any relevant information in the documents to answer your question.",
+    "citations": [],
+    "has_answer": False,
+}
+
+# Early-refresh tasks, referenced until they finish
+_background_tasks: set = set()
 
 
 class QueryService:
@@ -28,7 +37,12 @@ class QueryService:
         top_k: int = 5,
         conversation_history: Optional[List[Dict]] = None,
     ) -> Dict:
-        """Run the RAG pipeline for a user question."""
+        """Run the RAG pipeline for a user question.
+
+        Identical questions asked at the same time (same cache key) share one
+        run of the pipeline: in this process, and across workers through a
+        Redis lock, followers wait for the leader's cached answer.
+        """
         cached_answer = await QueryService.get_cached_answer(
             query,
             document_ids,
@@ -37,62 +51,285 @@ class QueryService:
         if cached_answer:
             return {**cached_answer, "cache_hit": True}
 
-        query_embedding = await QueryService.generate_query_embedding(query)
-        retrieved_chunks = await QueryService.semantic_search(
-            query_embedding,
+        async def read_shared():
+            shared = await QueryService.get_cached_answer(query, document_ids, conversation_history, refresh=False)
+            return {**shared, "cache_hit": True} if shared else None
+
+        return await get_single_flight("answers").run(
+            await QueryService.answer_cache_key(query, document_ids, conversation_history),
+            lambda: QueryService.compute_answer(query, document_ids, top_k, conversation_history),
+            read_shared,
+        )
+
+    @staticmethod
+    async def compute_answer(
+        query: str,
+        document_ids: Optional[List[str]],
+        top_k: int,
+        conversation_history: Optional[List[Dict]],
+        semantic: bool = True,
+    ) -> Dict:
+        """Everything after an exact-cache miss: the semantic tier, retrieval, generation and caching."""
+        started = time.monotonic()
+        # Read before retrieval: if the documents change meanwhile, this answer is cached as already stale
+        generation = await index_generation(document_ids)
+        cached_answer, retrieved_chunks, query_embedding = await QueryService.find_answer_or_chunks(
+            query,
             document_ids,
             top_k,
+            conversation_history,
+            semantic,
         )
+        if cached_answer:
+            return {**cached_answer, "cache_hit": True}
 
         if not retrieved_chunks:
-            return {
-                "answer": "I couldn't find any relevant information in the documents to answer your question.",
-                "citations": [],
-                "has_answer": False,
-                "cache_hit": False,
-            }
+            return {**NO_CONTEXT_ANSWER, "cache_hit": False}
 
         answer = await QueryService.generate_answer(
             query,
-            retrieved_chunks,
+            QueryService.pack_context(retrieved_chunks),
             conversation_history,
         )
-        await QueryService.cache_answer(
+        await QueryService.remember_answer(
             query,
             document_ids,
             conversation_history,
+            query_embedding,
             answer,
+            compute_time=time.monotonic() - started,
+            top_k=top_k,
+            generation=generation,
         )
 
         return {**answer, "cache_hit": False}
 
     @staticmethod
-    async def generate_query_embedding(query: str) -> List[float]:
-        """Generate and cache an embedding for a query via REST API."""
-        cached = await DocumentService.get_cached_embedding(query)
-        if cached:
-            return cached
-
-        payload = {
-            "model": "models/gemini-embedding-001",
-            "content": {"parts": [{"text": query}]},
-            "taskType": "RETRIEVAL_QUERY",
-            "outputDimensionality": 768, 
-        }
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                _EMBED_URL,
-                json=payload,
-                params={"key": settings.GOOGLE_API_KEY},
+    async def stream_answer(
+        query: str,
+        document_ids: Optional[List[str]] = None,
+        top_k: int = 5,
+        conversation_history: Optional[List[Dict]] = None,
+    ) -> AsyncIterator[Tuple[str, object]]:
+        """The RAG pipeline as it happens: ("token", text) pairs, then ("done", result).
+
+        The result has the same fields as answer_query's. Cached answers, and
+        answers another request in this process is already producing, arrive
+        as a single token. Caches are filled only once the stream completes.
+        """
+        cached_answer = await QueryService.get_cached_answer(
+            query,
+            document_ids,
+            conversation_history,
+        )
+        if cached_answer:
+            yield "token", cached_answer["answer"]
+            yield "done", {**cached_answer, "cache_hit": True}
+            return
+
+        flights = get_single_flight("answers")
+        key = await QueryService.answer_cache_key(query, document_ids, conversation_history)
+        # As in SingleFlight.run: if the leader abandons, the first follower to wake takes over
+        while (flight := flights.join(key)) is not None:
+            try:
+                result = await flights.follow(flight)
+            except LookupError:
+                continue
+            yield "token", result["answer"]
+            yield "done", result
+            return
+
+        flights.begin(key)
+        try:
+            started = time.monotonic()
+            generation = await index_generation(document_ids)
+            cached_answer, retrieved_chunks, query_embedding = await QueryService.find_answer_or_chunks(
+                query,
+                document_ids,
+                top_k,
+                conversation_history,
             )
-            response.raise_for_status()
-            values = response.json()["embedding"]["values"]
 
-        dim = settings.EMBEDDING_DIMENSION
-        if len(values) > dim:
-            values = values[:dim]
+            if cached_answer:
+                result = {**cached_answer, "cache_hit": True}
+                yield "token", result["answer"]
+            elif not retrieved_chunks:
+                result = {**NO_CONTEXT_ANSWER, "cache_hit": False}
+                yield "token", result["answer"]
+            else:
+                sources = QueryService.pack_context(retrieved_chunks)
+                parts = []
+                async for text in QueryService.generate_answer_stream(query, sources, conversation_history):
+                    parts.append(text)
+                    yield "token", text
+
+                answer = QueryService.parse_streamed_answer("".join(parts), sources)
+                await QueryService.remember_answer(
+                    query,
+                    document_ids,
+                    conversation_history,
+                    query_embedding,
+                    answer,
+                    compute_time=time.monotonic() - started,
+                    top_k=top_k,
+                    generation=generation,
+                )
+                result = {**answer, "cache_hit": False}
+        except Exception as e:
+            flights.finish(key, error=e)
+            raise
+        except BaseException:
+            # Client went away mid-stream; anyone waiting computes the answer themselves
+            flights.abandon(key)
+            raise
+
+        flights.finish(key, result)
+        yield "done", result
+
+    @staticmethod
+    async def find_answer_or_chunks(
+        query: str,
+        document_ids: Optional[List[str]],
+        top_k: int,
+        conversation_history: Optional[List[Dict]],
+        semantic: bool = True,
+    ) -> Tuple[Optional[Dict], Optional[List[Dict]], Optional[List[float]]]:
+        """The semantic tier, then retrieval on a miss: (cached answer, chunks, query embedding).
+
+        The full-text half of hybrid retrieval starts first, so it runs while
+        the query embedding and the semantic lookup are in progress; it is
+        cancelled if the semantic tier answers.
+        """
+        lexical = QueryService.start_lexical_search(query, document_ids, top_k)
+        try:
+            cached_answer, query_embedding = None, None
+            if semantic:
+                cached_answer, query_embedding = await QueryService.lookup_semantic_answer(
+                    query,
+                    document_ids,
+                    conversation_history,
+                )
+                if cached_answer:
+                    return cached_answer, None, query_embedding
+
+            retrieved_chunks = await QueryService.retrieve(
+                query,
+                document_ids,
+                top_k,
+                query_embedding=query_embedding,
+                lexical=lexical,
+            )
+            return None, retrieved_chunks, query_embedding
+        finally:
+            if lexical is not None:
+                lexical.cancel()
+
+    @staticmethod
+    async def lookup_semantic_answer(
+        query: str,
+        document_ids: Optional[List[str]],
+        conversation_history: Optional[List[Dict]],
+    ) -> Tuple[Optional[Dict], Optional[List[float]]]:
+        """An answer to an earlier, differently worded query with the same meaning; also returns the query embedding if computed."""
+        if not QueryService.uses_semantic_cache(query, conversation_history):
+            return None, None
+
+        query_embedding = await QueryService.generate_query_embedding(query)
+        cached_answer = await SemanticCache.lookup(query, query_embedding, document_ids)
+        if cached_answer:
+            await QueryService.cache_answer(query, document_ids, conversation_history, cached_answer)
+        return cached_answer, query_embedding
+
+    @staticmethod
+    async def remember_answer(
+        query: str,
+        document_ids: Optional[List[str]],
+        conversation_history: Optional[List[Dict]],
+        query_embedding: Optional[List[float]],
+        answer: Dict,
+        compute_time: float = 0.0,
+        top_k: Optional[int] = None,
+        generation: Optional[str] = None,
+    ) -> None:
+        await QueryService.cache_answer(
+            query,
+            document_ids,
+            conversation_history,
+            answer,
+            compute_time=compute_time,
+            top_k=top_k,
+            generation=generation,
+        )
+        if query_embedding is not None and answer["has_answer"]:
+            await SemanticCache.store(query, query_embedding, document_ids, answer, generation)
+
+    @staticmethod
+    def should_refresh_early(meta: Dict, now: float, rand: float) -> bool:
+        """XFetch: refresh with rising probability as expiry nears, earlier for answers that were slow to compute."""
+        beta = settings.CACHE_EARLY_REFRESH_BETA
+        compute_time = meta.get("compute_time") or 0.0
+        if beta <= 0 or compute_time <= 0 or "expires_at" not in meta:
+            return False
+        return now - compute_time * beta * math.log(max(rand, 1e-12)) >= meta["expires_at"]
+
+    @staticmethod
+    def refresh_in_background(
+        query: str,
+        document_ids: Optional[List[str]],
+        conversation_history: Optional[List[Dict]],
+        top_k: int,
+    ) -> None:
+        """Recompute a cached answer while the current one keeps being served; one refresh per key."""
+        flights = get_single_flight("answers")
+
+        async def read_shared():
+            # Another worker holds the lock and is refreshing; keep the current answer
+            return await QueryService.get_cached_answer(query, document_ids, conversation_history, refresh=False)
+
+        async def refresh():
+            try:
+                key = await QueryService.answer_cache_key(query, document_ids, conversation_history)
+                if flights.join(key) is not None:
+                    return
+                await flights.run(
+                    key,
+                    lambda: QueryService.compute_answer(query, document_ids, top_k, conversation_history, semantic=False),
+                    read_shared,
+                )
+            except Exception as e:
+                print(f"Early answer refresh failed: {e}")
+
+        task = asyncio.create_task(refresh())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
 
-        await DocumentService.cache_embedding(query, values)
+    @staticmethod
+    async def generate_query_embedding(query: str) -> List[float]:
+        """Generate and cache an embedding for a query over the shared HTTP client.
+
+        Checked in the in-process cache first, then Redis; concurrent misses
+        for the same text are coalesced.
+        """
+        local_cache = get_local_cache()
+        cache_key = DocumentService._embedding_cache_key(query)
+        local = local_cache.get(cache_key)
+        if local is not None:
+            return decode_embedding(local)
+
+        async def read_shared():
+            return await DocumentService.get_cached_embedding(query)
+
+        async def compute():
+            values = await get_embedding_engine().embed_query(query)
+            await DocumentService.cache_embedding(query, values)
+            return values
+
+        values = await read_shared()
+        if not values:
+            # Concurrent requests for the same text share one API call
+            values = await get_single_flight("embeddings").run(cache_key, compute, read_shared)
+
+        local_cache.set(cache_key, encode_embedding(values), settings.EMBEDDING_CACHE_TTL)
         return values
 
     @staticmethod
@@ -101,57 +338,149 @@ class QueryService:
         document_ids: Optional[List[str]],
         top_k: int,
     ) -> List[Dict]:
-        """Search pgvector for chunks nearest to the query embedding."""
-        values = {
-            "query_embedding": DocumentService.vector_literal(query_embedding),
-            "limit": max(top_k * 2, top_k),
-        }
+        """Search for chunks nearest to the query embedding.
 
-        sql = """
-            SELECT
-                c.id,
-                c.content,
-                c.page_number,
-                d.title AS document_title,
-                d.id AS document_id,
-                1 - (c.embedding <=> CAST(:query_embedding AS vector)) AS similarity
-            FROM chunks c
-            JOIN documents d ON c.document_id = d.id
-            WHERE d.processing_status = 'completed'
-            AND c.embedding IS NOT NULL
+        Queries filtered to documents with few chunks between them are scored
+        exactly in process when the local backend is available; everything
+        else goes to pgvector.
         """
+        limit = max(top_k * 2, top_k)
+        results = None
+        pgvector_backend = get_pgvector_backend()
+        # Read once: it routes the query here and plans the pgvector scan
+        estimated_rows = await pgvector_backend.estimate_rows(document_ids)
+        local_backend = get_local_backend()
+        if local_backend is not None and local_backend.accepts(document_ids, estimated_rows):
+            results = await local_backend.search(query_embedding, document_ids, limit, estimated_rows)
+        if results is None:
+            results = await pgvector_backend.search(query_embedding, document_ids, limit, estimated_rows)
+
+        filtered = [
+            QueryService._to_chunk(row)
+            for row in results
+            if float(row["similarity"] or 0) >= settings.SIMILARITY_THRESHOLD
+        ]
+        return filtered[:top_k]
 
-        if document_ids:
-            placeholders = []
-            for index, document_id in enumerate(document_ids):
-                key = f"document_id_{index}"
-                values[key] = str(document_id)
-                placeholders.append(f"CAST(:{key} AS uuid)")
-            sql += f" AND d.id IN ({', '.join(placeholders)})"
-
-        sql += """
-            ORDER BY c.embedding <=> CAST(:query_embedding AS vector)
-            LIMIT :limit
+    @staticmethod
+    async def retrieve(
+        query: str,
+        document_ids: Optional[List[str]],
+        top_k: int,
+        query_embedding: Optional[List[float]] = None,
+        lexical: Optional[asyncio.Task] = None,
+    ) -> List[Dict]:
+        """Find the chunks to answer from.
+
+        Exact-term queries (IDs, error codes) are looked up with full-text
+        search alone and only fall back to vector search when nothing matches.
+        Other queries run full-text and vector search concurrently, so the
+        full-text side does not wait on the embedding call, and fuse the two
+        rankings. Callers that already started the full-text search (see
+        start_lexical_search) or computed the embedding pass them in.
         """
+        if QueryService.is_exact_term_query(query):
+            rows = await get_lexical_backend().search(query, document_ids, top_k, match_all=True)
+            if rows:
+                return [QueryService._to_chunk(row) for row in rows]
+            return await QueryService.vector_search(query, document_ids, top_k, query_embedding)
+
+        if not settings.HYBRID_SEARCH:
+            return await QueryService.vector_search(query, document_ids, top_k, query_embedding)
+
+        if lexical is None:
+            lexical = QueryService.start_lexical_search(query, document_ids, top_k)
+        # Fuse deeper lists than needed: a chunk ranked low by both can beat one ranked high by one
+        depth = top_k * 2
+        lexical_rows, vector_chunks = await asyncio.gather(
+            lexical,
+            QueryService.vector_search(query, document_ids, depth, query_embedding),
+        )
+        lexical_chunks = [QueryService._to_chunk(row) for row in lexical_rows]
+        return QueryService.reciprocal_rank_fusion([vector_chunks, lexical_chunks], settings.HYBRID_RRF_K)[:top_k]
 
-        results = await database.fetch_all(sql, values)
-        filtered = []
-        for row in results:
-            similarity = float(row["similarity"] or 0)
-            if similarity < settings.SIMILARITY_THRESHOLD:
-                continue
-            filtered.append(
-                {
-                    "chunk_id": str(row["id"]),
-                    "content": row["content"],
-                    "page_number": row["page_number"],
-                    "document_title": row["document_title"],
-                    "document_id": str(row["document_id"]),
-                    "similarity": similarity,
-                }
-            )
+    @staticmethod
+    def start_lexical_search(
+        query: str,
+        document_ids: Optional[List[str]],
+        top_k: int,
+    ) -> Optional[asyncio.Task]:
+        """Start the full-text half of hybrid retrieval as a task, or None if retrieve won't fuse rankings."""
+        if QueryService.is_exact_term_query(query) or not settings.HYBRID_SEARCH:
+            return None
+        task = asyncio.create_task(get_lexical_backend().search(query, document_ids, top_k * 2))
+        # Abandoned when the semantic tier answers; don't log its error as never retrieved
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
 
-        return filtered[:top_k]
+    @staticmethod
+    async def vector_search(
+        query: str,
+        document_ids: Optional[List[str]],
+        top_k: int,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict]:
+        if query_embedding is None:
+            query_embedding = await QueryService.generate_query_embedding(query)
+        return await QueryService.semantic_search(query_embedding, document_ids, top_k)
+
+    @staticmethod
+    def uses_semantic_cache(query: str, conversation_history: Optional[List[Dict]]) -> bool:
+        """Follow-ups depend on the conversation, and exact-term lookups never compute an embedding."""
+        return (
+            settings.SEMANTIC_CACHE_ENABLED
+            and not conversation_history
+            and not QueryService.is_exact_term_query(query)
+        )
+
+    @staticmethod
+    def is_exact_term_query(query: str) -> bool:
+        """Whether the query is an identifier-style lookup that full-text search answers on its own."""
+        return settings.LEXICAL_FAST_PATH and re.match(settings.LEXICAL_FAST_PATH_PATTERN, query) is not None
+
+    @staticmethod
+    def reciprocal_rank_fusion(rankings: List[List[Dict]], k: int) -> List[Dict]:
+        """Merge ranked chunk lists by the sum of 1 / (k + rank) over the lists each chunk appears in.
+
+        A chunk found by several lists keeps the fields from the first one and
+        takes the scores it lacks from the others, so a chunk found by both
+        searches reports its cosine similarity and its lexical rank, and one
+        found only by full-text search has no similarity.
+        """
+        scores: Dict[str, float] = {}
+        chunks: Dict[str, Dict] = {}
+        for ranking in rankings:
+            for rank, chunk in enumerate(ranking, start=1):
+                chunk_id = chunk["chunk_id"]
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+                if chunk_id not in chunks:
+                    chunks[chunk_id] = dict(chunk)
+                    continue
+                for field in ("similarity", "lexical_rank"):
+                    if chunks[chunk_id].get(field) is None:
+                        chunks[chunk_id][field] = chunk.get(field)
+
+        return sorted(chunks.values(), key=lambda chunk: scores[chunk["chunk_id"]], reverse=True)
+
+    @staticmethod
+    def _to_chunk(row: Dict) -> Dict:
+        return {
+            "chunk_id": str(row["id"]),
+            "content": row["content"],
+            "page_number": row["page_number"],
+            "chunk_index": row["chunk_index"],
+            "token_count": row["token_count"],
+            "document_title": row["document_title"],
+            "document_id": str(row["document_id"]),
+            "similarity": QueryService._score(row, "similarity"),
+            "lexical_rank": QueryService._score(row, "lexical_rank"),
+        }
+
+    @staticmethod
+    def _score(row: Dict, field: str) -> Optional[float]:
+        # Vector rows carry only a similarity and full-text rows only a lexical rank
+        value = row.get(field)
+        return None if value is None else float(value)
 
     @staticmethod
     async def generate_answer(
@@ -161,18 +490,13 @@ class QueryService:
     ) -> Dict:
         """Generate a grounded answer using Gemini."""
         context = QueryService.build_context(chunks)
-        response = await asyncio.to_thread(
-            _llm_client.models.generate_content,
-            model=settings.LLM_MODEL,
+        response_text = await get_llm_client().generate(
             contents=QueryService.build_user_prompt(query, context, conversation_history),
-            config=types.GenerateContentConfig(
-                system_instruction=QueryService.get_system_prompt(),
-                temperature=0.1,
-                max_output_tokens=800,
-                response_mime_type="application/json",
-            ),
+            system_instruction=QueryService.get_system_prompt(),
+            temperature=0.1,
+            max_output_tokens=800,
+            response_mime_type="application/json",
         )
-        response_text = getattr(response, "text", "") or ""
 
         try:
             answer_json = json.loads(QueryService._strip_json_fences(response_text))
@@ -194,6 +518,41 @@ class QueryService:
             "has_answer": bool(answer_json.get("has_answer", True)),
         }
 
+    @staticmethod
+    async def generate_answer_stream(
+        query: str,
+        chunks: List[Dict],
+        conversation_history: Optional[List[Dict]],
+    ) -> AsyncIterator[str]:
+        """Stream a grounded plain-text answer, citing sources inline as [SOURCE X]."""
+        context = QueryService.build_context(chunks)
+        async for text in get_llm_client().stream(
+            contents=QueryService.build_user_prompt(query, context, conversation_history, stream=True),
+            system_instruction=QueryService.get_system_prompt(stream=True),
+            temperature=0.1,
+            max_output_tokens=800,
+        ):
+            yield text
+
+    @staticmethod
+    def parse_streamed_answer(text: str, chunks: List[Dict]) -> Dict:
+        """Turn a finished plain-text answer into the answer dict; citations come from its [SOURCE X] markers."""
+        text = text.strip()
+        return {
+            "answer": text or "I could not generate a response for this question.",
+            "citations": QueryService.map_citations(re.findall(r"\[SOURCE\s*(\d+)\]", text, re.IGNORECASE), chunks),
+            "has_answer": bool(text) and NOT_ENOUGH_INFORMATION.lower() not in text.lower(),
+        }
+
+    @staticmethod
+    def pack_context(chunks: List[Dict]) -> List[Dict]:
+        """The sources to put in the prompt: neighbouring chunks merged, within CONTEXT_TOKEN_BUDGET.
+
+        Source numbers in the answer refer to positions in this list, so it is
+        what build_context and map_citations must be given.
+        """
+        return pack_chunks(chunks, settings.CONTEXT_TOKEN_BUDGET, settings.CONTEXT_MERGE_CHUNKS)
+
     @staticmethod
     def build_context(chunks: List[Dict]) -> str:
         """Format retrieved chunks for the LLM prompt."""
@@ -209,17 +568,22 @@ Content: {chunk['content']}
         return "\n\n".join(parts)
 
     @staticmethod
-    def get_system_prompt() -> str:
-        return """You are an expert document analysis assistant. Answer questions based ONLY on the provided context.
+    def get_system_prompt(stream: bool = False) -> str:
+        response_format = (
+            "Respond in plain text, citing sources inline."
+            if stream
+            else 'Respond in JSON: {"answer": "...", "has_answer": true, "citations": [1, 2]}.'
+        )
+        return f"""You are an expert document analysis assistant. Answer questions based ONLY on the provided context.
 Rules:
 1. Only use information explicitly stated in the context.
 2. Cite sources using [SOURCE X] notation.
-3. If the context lacks the answer, say: "I don't have enough information in the provided documents to answer this question."
-4. Respond in JSON: {"answer": "...", "has_answer": true, "citations": [1, 2]}.
+3. If the context lacks the answer, say: "{NOT_ENOUGH_INFORMATION}"
+4. {response_format}
 5. Be concise, precise, and include useful source-backed detail when available."""
 
     @staticmethod
-    def build_user_prompt(query: str, context: str, history: Optional[List[Dict]]) -> str:
+    def build_user_prompt(query: str, context: str, history: Optional[List[Dict]], stream: bool = False) -> str:
         parts = []
 
         if history:
@@ -228,13 +592,18 @@ Rules:
                 parts.append(f"{msg['role']}: {msg['content']}")
             parts.append("---")
 
+        instruction = (
+            "Answer in plain text, citing sources as [SOURCE X]."
+            if stream
+            else "Provide a JSON response with answer, has_answer, and citations as source numbers."
+        )
         parts.append(
             f"""Context:
 {context}
 
 Question: {query}
 
-Provide a JSON response with answer, has_answer, and citations as source numbers."""
+{instruction}"""
         )
         return "\n".join(parts)
 
@@ -272,48 +641,110 @@ Provide a JSON response with answer, has_answer, and citations as source numbers
         query: str,
         document_ids: Optional[List[str]],
         conversation_history: Optional[List[Dict]],
+        refresh: bool = True,
     ) -> Optional[Dict]:
-        """Check Redis for a cached answer, if Redis is available."""
-        redis_client = await get_redis()
-        if redis_client is None:
-            return None
+        """Check the in-process cache, then Redis, for a cached answer.
 
-        cached = await redis_client.get(
-            QueryService.build_cache_key(query, document_ids, conversation_history)
-        )
-        if not cached:
-            return None
+        With refresh, a hit close to expiry may start recomputing the answer
+        in the background (see should_refresh_early).
+        """
+        local_cache = get_local_cache()
+        cache_key = await QueryService.answer_cache_key(query, document_ids, conversation_history)
+        cached = local_cache.get(cache_key)
+
+        if cached is None:
+            redis_client = await get_redis()
+            if redis_client is None:
+                return None
+
+            cached = await redis_client.get(cache_key)
+            if not cached:
+                return None
+            local_cache.set(
+                cache_key,
+                cached,
+                settings.QUERY_CACHE_TTL,
+                QueryService.answer_cache_tags(document_ids),
+            )
 
         try:
-            return json.loads(cached)
+            answer = json.loads(cached)
         except json.JSONDecodeError:
             return None
 
+        meta = answer.pop("_meta", None)
+        if (
+            refresh
+            and meta
+            and meta.get("top_k")
+            and QueryService.should_refresh_early(meta, time.time(), random.random())
+        ):
+            QueryService.refresh_in_background(query, document_ids, conversation_history, meta["top_k"])
+        return answer
+
     @staticmethod
     async def cache_answer(
         query: str,
         document_ids: Optional[List[str]],
         conversation_history: Optional[List[Dict]],
         answer: Dict,
+        compute_time: float = 0.0,
+        top_k: Optional[int] = None,
+        generation: Optional[str] = None,
     ) -> None:
-        """Cache an answer, if Redis is available."""
+        """Cache an answer in process and, if available, in Redis.
+
+        compute_time and top_k are kept with the answer so it can be
+        refreshed before it expires. generation is the index generation the
+        answer was computed against; by default, the current one.
+        """
+        if generation is None:
+            generation = await index_generation(document_ids)
+        cache_key = QueryService.build_cache_key(query, document_ids, conversation_history, generation)
+        meta = {
+            "expires_at": time.time() + settings.QUERY_CACHE_TTL,
+            "compute_time": round(compute_time, 3),
+            "top_k": top_k,
+        }
+        payload = json.dumps({**answer, "_meta": meta})
+        get_local_cache().set(
+            cache_key,
+            payload,
+            settings.QUERY_CACHE_TTL,
+            QueryService.answer_cache_tags(document_ids),
+        )
+
         redis_client = await get_redis()
         if redis_client is None:
             return
 
-        await redis_client.setex(
-            QueryService.build_cache_key(query, document_ids, conversation_history),
-            settings.QUERY_CACHE_TTL,
-            json.dumps(answer),
-        )
+        await redis_client.setex(cache_key, settings.QUERY_CACHE_TTL, payload)
+
+    @staticmethod
+    def answer_cache_tags(document_ids: Optional[List[str]]) -> List[str]:
+        """Tags that drop a cached answer when one of its documents changes."""
+        if not document_ids:
+            return [ALL_DOCUMENTS_TAG]
+        return [document_tag(str(doc_id)) for doc_id in document_ids]
+
+    @staticmethod
+    async def answer_cache_key(
+        query: str,
+        document_ids: Optional[List[str]],
+        conversation_history: Optional[List[Dict]] = None,
+    ) -> str:
+        """The cache key for this query under the current index generation of its documents."""
+        generation = await index_generation(document_ids)
+        return QueryService.build_cache_key(query, document_ids, conversation_history, generation)
 
     @staticmethod
     def build_cache_key(
         query: str,
         document_ids: Optional[List[str]],
         conversation_history: Optional[List[Dict]] = None,
+        generation: str = "",
     ) -> str:
-        """Generate a cache key scoped to the query, documents, and recent context."""
+        """Generate a cache key scoped to the query, documents, recent context and index generation."""
         doc_str = ",".join(sorted(str(doc_id) for doc_id in document_ids)) if document_ids else "all"
         history_payload = [
             {
@@ -327,6 +758,7 @@ Provide a JSON response with answer, has_answer, and citations as source numbers
                 "query": query.strip(),
                 "documents": doc_str,
                 "history": history_payload,
+                "generation": generation,
             },
             sort_keys=True,
         )
@@ -0,0 +1,114 @@
+# backend/app/services/reindexer.py
+import asyncio
+from typing import List
+
+from app.core.config import settings
+from app.core.database import database
+from app.services.document_service import DocumentService
+from app.services.job_queue import JobQueue
+
+# pg advisory lock id, so only one worker at a time picks documents to re-index
+_REINDEX_LOCK_KEY = 74210015
+
+
+class Reindexer:
+    """Finds documents indexed under an older chunking/embedding config and queues re-index jobs.
+
+    Throttled by REINDEX_MAX_IN_FLIGHT, and resumable by construction: the
+    only state is each document's index_config (and whether its upload was
+    kept), so after a restart the next pass simply picks up the documents
+    that are still out of date.
+    """
+
+    @staticmethod
+    async def enqueue_stale(max_in_flight: int) -> int:
+        """Queue re-index jobs up to `max_in_flight` outstanding; returns how many were added."""
+        async with database.transaction():
+            locked = await database.fetch_val(
+                "SELECT pg_try_advisory_xact_lock(:key)",
+                {"key": _REINDEX_LOCK_KEY},
+            )
+            if not locked:
+                return 0
+
+            in_flight = await database.fetch_val(
+                """
+                SELECT COUNT(*) FROM ingestion_jobs
+                WHERE kind = 'reindex' AND status IN ('queued', 'running')
+                """
+            )
+            slots = max_in_flight - in_flight
+            if slots <= 0:
+                return 0
+
+            queued = 0
+            while slots > 0:
+                documents = await Reindexer._stale_documents(slots)
+                if not documents:
+                    break
+                for document in documents:
+                    document_id = str(document["id"])
+                    file_path = DocumentService.upload_path(document_id)
+                    if not await asyncio.to_thread(file_path.exists):
+                        # Uploaded before originals were kept; a job could only fail, every cooldown
+                        await database.execute(
+                            "UPDATE documents SET reindexable = FALSE WHERE id = :document_id",
+                            {"document_id": document_id},
+                        )
+                        print(f"Document {document_id} has no stored upload; it will not be re-indexed")
+                        continue
+                    await JobQueue.enqueue(document_id, str(file_path), document["filename"], kind="reindex")
+                    queued += 1
+                    slots -= 1
+
+        if queued:
+            JobQueue.notify_local_workers()
+            print(f"Queued {queued} documents for re-indexing")
+        return queued
+
+    @staticmethod
+    async def _stale_documents(limit: int) -> List:
+        """Out-of-date documents to queue, oldest first.
+
+        Skips documents with a job in progress, whose last re-index failed
+        recently, or that have no stored upload to rebuild from.
+        """
+        return await database.fetch_all(
+            """
+            SELECT d.id, d.filename
+            FROM documents d
+            WHERE d.processing_status = 'completed'
+            AND d.reindexable
+            AND d.index_config IS DISTINCT FROM :index_config
+            AND NOT EXISTS (
+                SELECT 1 FROM ingestion_jobs j
+                WHERE j.document_id = d.id
+                AND (
+                    j.status IN ('queued', 'running')
+                    OR (
+                        j.kind = 'reindex'
+                        AND j.status = 'failed'
+                        AND j.updated_at > NOW() - make_interval(secs => :cooldown)
+                    )
+                )
+            )
+            ORDER BY d.upload_timestamp
+            LIMIT :limit
+            """,
+            {
+                "index_config": DocumentService.index_config(),
+                "cooldown": float(settings.REINDEX_FAILURE_COOLDOWN_SECONDS),
+                "limit": limit,
+            },
+        )
+
+    @staticmethod
+    async def stale_count() -> int:
+        """Completed documents whose chunks were built with a different config and can be rebuilt."""
+        return await database.fetch_val(
+            """
+            SELECT COUNT(*) FROM documents
+            WHERE processing_status = 'completed' AND reindexable AND index_config IS DISTINCT FROM :index_config
+            """,
+            {"index_config": DocumentService.index_config()},
+        )
@@ -0,0 +1,594 @@
+# backend/app/services/search_backends.py
+"""Vector search backends behind QueryService.semantic_search.
+
+PgvectorBackend runs the search in Postgres and can answer any query.
+LocalVectorBackend keeps each document's vectors in a memory-mapped float32
+matrix and scores them exactly with NumPy. It is only used when the query is
+filtered to completed documents with few chunks between them: there, an
+exact scan in process beats an HNSW scan plus post-filter in Postgres.
+
+LexicalBackend is the full-text half of hybrid retrieval; it searches by the
+query text instead of its embedding, so it is not a SearchBackend.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import TEXT_SEARCH_CONFIG, database
+from app.core.local_cache import add_document_listener
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency; pgvector handles every query without it
+    np = None
+
+
+class SearchBackend(ABC):
+    """A vector search engine that QueryService.semantic_search can route a query to."""
+
+    name = "base"
+
+    @abstractmethod
+    async def search(
+        self,
+        query_embedding: List[float],
+        document_ids: Optional[List[str]],
+        limit: int,
+        estimated_rows: Optional[int] = None,
+    ) -> Optional[List[Dict]]:
+        """Nearest chunks as dicts with id, content, page_number, chunk_index, token_count,
+        document_title, document_id and similarity, best first; None if it cannot serve the query.
+
+        `estimated_rows` is PgvectorBackend.estimate_rows for the filter, when the
+        caller has already read it; backends that need no estimate ignore it.
+        """
+
+
+def document_placeholders(document_ids: List[str], values: Dict) -> str:
+    """Bind each document id into `values`; returns the placeholders for an IN list."""
+    placeholders = []
+    for index, document_id in enumerate(document_ids):
+        key = f"document_id_{index}"
+        values[key] = str(document_id)
+        placeholders.append(f"CAST(:{key} AS uuid)")
+    return ", ".join(placeholders)
+
+
+class PgvectorBackend(SearchBackend):
+    """Searches chunks in Postgres, planning each query as an exact scan or an HNSW scan.
+
+    Filters that leave few rows (a handful of small documents) are scanned
+    exactly through idx_chunks_document_id: cheap, and never short of rows.
+    Everything else uses HNSW, with iterative scans (pgvector >= 0.8) so that
+    rows removed by the filters are replaced instead of leaving gaps. The
+    similarity threshold is applied in SQL as a cosine-distance bound.
+    """
+
+    name = "pgvector"
+
+    def __init__(self):
+        self._iterative_scan_supported: Optional[bool] = None
+
+    @staticmethod
+    def compact_distance(mode: str) -> str:
+        """Distance over the quantized expression that the mode's HNSW index is built on."""
+        dimension = settings.EMBEDDING_DIMENSION
+        if mode == "halfvec":
+            return (
+                f"c.embedding::halfvec({dimension}) <=> "
+                f"CAST(:query_embedding AS vector)::halfvec({dimension})"
+            )
+        if mode == "binary":
+            return (
+                f"binary_quantize(c.embedding)::bit({dimension}) <~> "
+                f"binary_quantize(CAST(:query_embedding AS vector))::bit({dimension})"
+            )
+        raise ValueError(f"Unknown VECTOR_INDEX_MODE: {mode}")
+
+    @staticmethod
+    def choose_strategy(document_ids: Optional[List[str]], estimated_rows: Optional[int]) -> str:
+        """"exact" when the filter leaves at most SEARCH_EXACT_MAX_ROWS chunks, else "hnsw"."""
+        if document_ids and estimated_rows is not None and estimated_rows <= settings.SEARCH_EXACT_MAX_ROWS:
+            return "exact"
+        return "hnsw"
+
+    @staticmethod
+    def build_query(
+        query_embedding: List[float],
+        document_ids: Optional[List[str]],
+        limit: int,
+        mode: str = "vector",
+        strategy: str = "hnsw",
+        max_distance: float = 2.0,
+    ) -> tuple:
+        """SQL and values for a nearest-chunk search.
+
+        "exact" orders every candidate row by true distance (run it with index
+        scans disabled, see session_settings). "hnsw" in "vector" mode takes the
+        nearest rows from the float32 index; in "halfvec" and "binary" modes a
+        compact index supplies limit * VECTOR_RESCORE_FACTOR candidates that are
+        reordered by exact distance. Rows further than max_distance are dropped.
+        """
+        values = {
+            "query_embedding": query_embedding,
+            "limit": limit,
+            "max_distance": max_distance,
+        }
+
+        columns = (
+            "c.id, c.content, c.page_number, c.chunk_index, c.token_count, "
+            "d.title AS document_title, d.id AS document_id"
+        )
+        filters = """
+            FROM chunks c
+            JOIN documents d ON c.document_id = d.id AND c.index_version = d.index_version
+            WHERE d.processing_status IN ('completed', 'partial')
+            AND c.embedding IS NOT NULL
+        """
+
+        if document_ids:
+            filters += f" AND c.document_id IN ({document_placeholders(document_ids, values)})"
+
+        distance = "c.embedding <=> CAST(:query_embedding AS vector)"
+        if strategy == "exact":
+            sql = f"""
+            SELECT {columns},
+                1 - ({distance}) AS similarity
+            {filters}
+            AND {distance} <= :max_distance
+            ORDER BY {distance}
+            LIMIT :limit
+            """
+            return sql, values
+
+        if mode == "vector":
+            # Materialized so the distance bound filters the index results
+            # instead of being pushed into (and stalling) the index scan
+            sql = f"""
+            WITH nearest AS MATERIALIZED (
+                SELECT {columns}, {distance} AS distance
+                {filters}
+                ORDER BY {distance}
+                LIMIT :limit
+            )
+            SELECT id, content, page_number, chunk_index, token_count, document_title, document_id, 1 - distance AS similarity
+            FROM nearest
+            WHERE distance <= :max_distance
+            ORDER BY distance
+            """
+            return sql, values
+
+        values["shortlist"] = limit * settings.VECTOR_RESCORE_FACTOR
+        exact = "embedding <=> CAST(:query_embedding AS vector)"
+        sql = f"""
+            SELECT id, content, page_number, chunk_index, token_count, document_title, document_id,
+                1 - ({exact}) AS similarity
+            FROM (
+                SELECT {columns}, c.embedding
+                {filters}
+                ORDER BY {PgvectorBackend.compact_distance(mode)}
+                LIMIT :shortlist
+            ) shortlist
+            WHERE {exact} <= :max_distance
+            ORDER BY {exact}
+            LIMIT :limit
+        """
+        return sql, values
+
+    @staticmethod
+    def session_settings(strategy: str, limit: int, iterative_scan: bool) -> List[str]:
+        """SET LOCAL statements for the search transaction."""
+        if strategy == "exact":
+            # Rules out the HNSW index; the document_id filter is served by a bitmap scan
+            return ["SET LOCAL enable_indexscan = off"]
+
+        statements = [f"SET LOCAL hnsw.ef_search = {min(max(limit, 40), 1000)}"]
+        if iterative_scan and settings.HNSW_ITERATIVE_SCAN != "off":
+            statements.append(f"SET LOCAL hnsw.iterative_scan = {settings.HNSW_ITERATIVE_SCAN}")
+            statements.append(f"SET LOCAL hnsw.max_scan_tuples = {int(settings.HNSW_MAX_SCAN_TUPLES)}")
+        return statements
+
+    async def estimate_rows(self, document_ids: Optional[List[str]]) -> Optional[int]:
+        """Chunks the document filter leaves, from the per-document counters (a primary-key lookup).
+
+        Documents indexed before chunks_indexed existed may still read 0; their
+        live chunks are counted instead, off the (document_id, index_version) index.
+        """
+        if not document_ids:
+            return None
+        values = {}
+        placeholders = document_placeholders(document_ids, values)
+        return await database.fetch_val(
+            f"""
+            SELECT COALESCE(SUM(
+                CASE WHEN d.chunks_indexed > 0 THEN d.chunks_indexed ELSE (
+                    SELECT COUNT(*) FROM chunks c
+                    WHERE c.document_id = d.id AND c.index_version = d.index_version
+                ) END
+            ), 0)
+            FROM documents d
+            WHERE d.id IN ({placeholders})
+            """,
+            values,
+        )
+
+    async def supports_iterative_scan(self) -> bool:
+        """hnsw.iterative_scan exists from pgvector 0.8.0; checked once per process."""
+        if self._iterative_scan_supported is None:
+            version = await database.fetch_val("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            try:
+                major, minor = (int(part) for part in (version or "0.0").split(".")[:2])
+            except ValueError:
+                major, minor = 0, 0
+            self._iterative_scan_supported = (major, minor) >= (0, 8)
+        return self._iterative_scan_supported
+
+    async def search(self, query_embedding, document_ids, limit, estimated_rows=None):
+        mode = settings.VECTOR_INDEX_MODE
+        if estimated_rows is None:
+            estimated_rows = await self.estimate_rows(document_ids)
+        strategy = self.choose_strategy(document_ids, estimated_rows)
+        sql, values = PgvectorBackend.build_query(
+            query_embedding,
+            document_ids,
+            limit,
+            mode,
+            strategy,
+            max_distance=1 - settings.SIMILARITY_THRESHOLD,
+        )
+        statements = self.session_settings(
+            strategy,
+            values.get("shortlist", limit),
+            await self.supports_iterative_scan() if strategy == "hnsw" else False,
+        )
+
+        async with database.transaction():
+            for statement in statements:
+                await database.execute(statement)
+            rows = await database.fetch_all(sql, values)
+
+        return [dict(row) for row in rows]
+
+
+class LexicalBackend:
+    """Full-text search over chunks.content_tsv (GIN-indexed).
+
+    Takes the query text rather than its embedding, so it can run while the
+    embedding is still being fetched, or instead of it. Rows have the same
+    keys as SearchBackend results except that "similarity" is replaced by
+    "lexical_rank", ts_rank_cd scaled into [0, 1): it is not comparable with
+    a cosine similarity.
+    """
+
+    name = "lexical"
+
+    @staticmethod
+    def build_query(query: str, document_ids: Optional[List[str]], limit: int, match_all: bool = False) -> tuple:
+        """SQL and values for a ranked full-text search.
+
+        With match_all every term must appear (exact-term lookups); otherwise
+        any term matches and chunks sharing more terms rank higher, which suits
+        natural-language questions.
+        """
+        terms = query if match_all else " or ".join(LexicalBackend.terms(query))
+        values = {"terms": terms, "limit": limit}
+        tsquery = f"websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', :terms)"
+
+        filters = ""
+        if document_ids:
+            filters = f" AND c.document_id IN ({document_placeholders(document_ids, values)})"
+
+        sql = f"""
+            SELECT
+                c.id,
+                c.content,
+                c.page_number,
+                c.chunk_index,
+                c.token_count,
+                d.title AS document_title,
+                d.id AS document_id,
+                ts_rank_cd(c.content_tsv, query, 32) AS lexical_rank
+            FROM chunks c
+            JOIN documents d ON c.document_id = d.id AND c.index_version = d.index_version
+            CROSS JOIN {tsquery} AS query
+            WHERE d.processing_status IN ('completed', 'partial')
+            AND c.content_tsv @@ query
+            {filters}
+            ORDER BY lexical_rank DESC
+            LIMIT :limit
+        """
+        return sql, values
+
+    @staticmethod
+    def terms(query: str) -> List[str]:
+        """Words and identifiers in the query, without websearch operators."""
+        return [term for term in re.findall(r"[\w][\w.\-/:#]*", query) if term.lower() != "or"]
+
+    async def search(
+        self,
+        query: str,
+        document_ids: Optional[List[str]],
+        limit: int,
+        match_all: bool = False,
+    ) -> List[Dict]:
+        if not self.terms(query):
+            return []
+        sql, values = self.build_query(query, document_ids, limit, match_all)
+        rows = await database.fetch_all(sql, values)
+        return [dict(row) for row in rows]
+
+
+class DocumentVectors:
+    """One document's live chunk set: unit-normalised float32 rows plus chunk metadata."""
+
+    def __init__(self, document_id: str, index_version: int, title: str, matrix, chunks: List[Dict]):
+        self.document_id = document_id
+        self.index_version = index_version
+        self.title = title
+        self.matrix = matrix
+        self.chunks = chunks  # id, content, page_number, chunk_index, token_count per row
+        self.loaded_at = time.monotonic()
+        # Chunk text plus a rough allowance for each row's dict and its small values
+        self.metadata_bytes = sum(len(chunk["content"]) + len(chunk["id"]) + 400 for chunk in chunks)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory the entry holds: the mapped matrix and the chunk metadata loaded beside it."""
+        return int(self.matrix.nbytes) + self.metadata_bytes
+
+
+class LocalVectorBackend(SearchBackend):
+    """Exact cosine top-k over per-document memory-mapped matrices.
+
+    Matrices are written once to LOCAL_VECTOR_DIR as {document}-v{index_version}.f32
+    (with a .json sidecar) and mapped read-only, so the OS page cache holds the
+    hot ones and several worker processes share them. Loaded documents are
+    kept in an LRU bounded by LOCAL_VECTOR_MAX_BYTES and dropped on document
+    changes; after LOCAL_CACHE_TTL their version is re-checked in Postgres.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str, max_bytes: int, max_rows: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self._loaded: "OrderedDict[str, DocumentVectors]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.bytes = 0
+        self.searches = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def accepts(self, document_ids: Optional[List[str]], estimated_rows: Optional[int]) -> bool:
+        """Route here only when the filter narrows the search to at most max_rows chunks.
+
+        `estimated_rows` comes from PgvectorBackend.estimate_rows, so one large
+        document is sent to Postgres however few documents the filter names.
+        """
+        return bool(document_ids) and estimated_rows is not None and estimated_rows <= self.max_rows
+
+    def evict(self, document_id: Optional[str]) -> None:
+        """Forget a loaded document, or all of them for None. Files are left for reuse."""
+        targets = list(self._loaded) if document_id is None else [str(document_id)]
+        for target in targets:
+            entry = self._loaded.pop(target, None)
+            if entry is not None:
+                self.bytes -= entry.nbytes
+
+    async def search(self, query_embedding, document_ids, limit, estimated_rows=None):
+        documents = []
+        for document_id in dict.fromkeys(str(doc_id) for doc_id in document_ids):
+            entry = await self._get(document_id)
+            if entry is False:
+                return None  # still indexing (or failed): only pgvector sees partial chunk sets
+            if entry is not None:
+                documents.append(entry)
+
+        self.searches += 1
+        if not documents:
+            return []
+        return self.score(np.asarray(query_embedding, dtype=np.float32), documents, limit)
+
+    @staticmethod
+    def score(query, documents: List[DocumentVectors], limit: int) -> List[Dict]:
+        """Cosine similarity against every row, then argpartition for the top `limit`."""
+        norm = float(np.linalg.norm(query))
+        if norm == 0.0:
+            return []
+        query = query / norm
+
+        similarities = np.concatenate([entry.matrix @ query for entry in documents])
+        owners = np.concatenate([
+            np.full(len(entry.chunks), index, dtype=np.int32)
+            for index, entry in enumerate(documents)
+        ])
+        rows = np.concatenate([np.arange(len(entry.chunks)) for entry in documents])
+
+        count = min(limit, len(similarities))
+        if count == 0:
+            return []
+        top = np.argpartition(-similarities, count - 1)[:count]
+        top = top[np.argsort(-similarities[top])]
+
+        results = []
+        for position in top:
+            entry = documents[owners[position]]
+            chunk = entry.chunks[rows[position]]
+            results.append({
+                "id": chunk["id"],
+                "content": chunk["content"],
+                "page_number": chunk["page_number"],
+                # Absent from sidecars written before these were stored
+                "chunk_index": chunk.get("chunk_index"),
+                "token_count": chunk.get("token_count"),
+                "document_title": entry.title,
+                "document_id": entry.document_id,
+                "similarity": float(similarities[position]),
+            })
+        return results
+
+    async def _get(self, document_id: str):
+        """Loaded vectors for a searchable document; None if it does not exist, False if not completed."""
+        entry = self._loaded.get(document_id)
+        if entry is not None and time.monotonic() - entry.loaded_at < settings.LOCAL_CACHE_TTL:
+            self._loaded.move_to_end(document_id)
+            return entry
+
+        # Concurrent queries for the same document share one load
+        pending = self._loading.get(document_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[document_id] = future
+        try:
+            result = await self._load(document_id, entry)
+            future.set_result(result)
+            return result
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved; waiters re-raise it
+            raise
+        finally:
+            del self._loading[document_id]
+
+    async def _load(self, document_id: str, current: Optional[DocumentVectors]):
+        document = await database.fetch_one(
+            "SELECT title, processing_status, index_version FROM documents WHERE id = :document_id",
+            {"document_id": document_id},
+        )
+        if document is None:
+            self.evict(document_id)
+            await asyncio.to_thread(self._remove_files, document_id)
+            return None
+        if document["processing_status"] != "completed":
+            self.evict(document_id)
+            return False
+
+        version = document["index_version"]
+        if current is not None and current.index_version == version:
+            current.loaded_at = time.monotonic()
+            self._loaded.move_to_end(document_id)
+            return current
+
+        base = self.directory / f"{document_id}-v{version}"
+        entry = await asyncio.to_thread(self._open, document_id, version, document["title"], base)
+        if entry is None:
+            chunks = await database.fetch_all(
+                """
+                SELECT id, content, page_number, chunk_index, token_count, embedding
+                FROM chunks
+                WHERE document_id = :document_id AND index_version = :index_version
+                AND embedding IS NOT NULL
+                ORDER BY chunk_index
+                """,
+                {"document_id": document_id, "index_version": version},
+            )
+            await asyncio.to_thread(self._write, base, chunks)
+            await asyncio.to_thread(self._remove_files, document_id, base.name)
+            entry = await asyncio.to_thread(self._open, document_id, version, document["title"], base)
+
+        self.evict(document_id)
+        self._loaded[document_id] = entry
+        self.bytes += entry.nbytes
+        self.loads += 1
+        while self.bytes > self.max_bytes and len(self._loaded) > 1:
+            _, oldest = self._loaded.popitem(last=False)
+            self.bytes -= oldest.nbytes
+            self.evictions += 1
+        return entry
+
+    @staticmethod
+    def _write(base: Path, chunks) -> None:
+        base.parent.mkdir(parents=True, exist_ok=True)
+        matrix = np.asarray([list(chunk["embedding"]) for chunk in chunks], dtype=np.float32)
+        if len(chunks):
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1, norms)
+        metadata = {
+            "rows": len(chunks),
+            "dimension": int(matrix.shape[1]) if len(chunks) else settings.EMBEDDING_DIMENSION,
+            "chunks": [
+                {
+                    "id": str(chunk["id"]),
+                    "content": chunk["content"],
+                    "page_number": chunk["page_number"],
+                    "chunk_index": chunk["chunk_index"],
+                    "token_count": chunk["token_count"],
+                }
+                for chunk in chunks
+            ],
+        }
+        # Write under temporary names and rename, so readers never map a partial file
+        suffix = f".{os.getpid()}.tmp"
+        matrix.tofile(f"{base}.f32{suffix}")
+        with open(f"{base}.json{suffix}", "w") as f:
+            json.dump(metadata, f)
+        os.replace(f"{base}.f32{suffix}", f"{base}.f32")
+        os.replace(f"{base}.json{suffix}", f"{base}.json")
+
+    def _remove_files(self, document_id: str, keep: Optional[str] = None) -> None:
+        """Delete a document's files from older index versions (all of them if keep is None)."""
+        for path in self.directory.glob(f"{document_id}-v*"):
+            if keep is None or not path.name.startswith(f"{keep}."):
+                path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _open(document_id: str, version: int, title: str, base: Path) -> Optional[DocumentVectors]:
+        try:
+            with open(f"{base}.json") as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        shape = (metadata["rows"], metadata["dimension"])
+        if metadata["rows"]:
+            matrix = np.memmap(f"{base}.f32", dtype=np.float32, mode="r", shape=shape)
+        else:
+            matrix = np.zeros(shape, dtype=np.float32)
+        return DocumentVectors(document_id, version, title, matrix, metadata["chunks"])
+
+    def stats(self) -> Dict:
+        return {
+            "documents_loaded": len(self._loaded),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "max_rows": self.max_rows,
+            "searches": self.searches,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_pgvector_backend() -> PgvectorBackend:
+    return PgvectorBackend()
+
+
+@lru_cache(maxsize=None)
+def get_lexical_backend() -> LexicalBackend:
+    return LexicalBackend()
+
+
+@lru_cache(maxsize=None)
+def get_local_backend() -> Optional[LocalVectorBackend]:
+    """The in-process backend, or None when disabled or NumPy is not installed."""
+    if not settings.LOCAL_VECTOR_SEARCH or np is None:
+        return None
+
+    backend = LocalVectorBackend(
+        settings.LOCAL_VECTOR_DIR,
+        settings.LOCAL_VECTOR_MAX_BYTES,
+        settings.LOCAL_VECTOR_MAX_ROWS,
+    )
+    add_document_listener(backend.evict)
+    return backend
@@ -0,0 +1,215 @@
+# backend/app/services/semantic_cache.py
+"""Answer cache keyed by query meaning rather than query text.
+
+Answers are stored in Postgres next to their query embedding. A new query
+over the same document scope reuses the nearest cached answer if its
+embedding is within SEMANTIC_CACHE_MAX_DISTANCE (cosine distance), so
+rephrasings ("what's the refund policy?") skip generation. The scope
+includes the index generation of its documents, like the exact answer
+cache's keys. Every hit is written to semantic_cache_audit so false hits
+can be reviewed and rejected.
+"""
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import database
+from app.core.local_cache import index_generation
+
+AUDIT_RETENTION_DAYS = 30
+
+
+class SemanticCache:
+    # Per-process counters, reported by /cache/stats
+    lookups = 0
+    hits = 0
+
+    @staticmethod
+    def scope_key(document_ids: Optional[List[str]], generation: str = "") -> str:
+        doc_str = ",".join(sorted(str(doc_id) for doc_id in document_ids)) if document_ids else "all"
+        return hashlib.sha256(f"{doc_str}|{generation}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    async def lookup(query: str, query_embedding: List[float], document_ids: Optional[List[str]]) -> Optional[Dict]:
+        """The answer cached for the nearest equivalent query in this scope, or None."""
+        SemanticCache.lookups += 1
+        try:
+            scope_key = SemanticCache.scope_key(document_ids, await index_generation(document_ids))
+            # Scope first (idx_semantic_cache_scope), then an exact distance over its few entries
+            row = await database.fetch_one(
+                """
+                WITH scoped AS MATERIALIZED (
+                    SELECT id, query, answer, query_embedding
+                    FROM semantic_cache
+                    WHERE scope_key = :scope_key AND expires_at > NOW()
+                )
+                SELECT id, query, answer, query_embedding <=> CAST(:query_embedding AS vector) AS distance
+                FROM scoped
+                ORDER BY distance
+                LIMIT 1
+                """,
+                {"query_embedding": query_embedding, "scope_key": scope_key},
+            )
+
+            if row is None or row["distance"] > settings.SEMANTIC_CACHE_MAX_DISTANCE:
+                return None
+
+            await database.execute(
+                """
+                WITH counted AS (
+                    UPDATE semantic_cache SET hits = hits + 1 WHERE id = :entry_id
+                )
+                INSERT INTO semantic_cache_audit (entry_id, query, cached_query, distance)
+                VALUES (:entry_id, :query, :cached_query, :distance)
+                """,
+                {
+                    "entry_id": row["id"],
+                    "query": query,
+                    "cached_query": row["query"],
+                    "distance": float(row["distance"]),
+                },
+            )
+        except Exception as e:
+            print(f"Semantic cache lookup failed: {e}")
+            return None
+
+        SemanticCache.hits += 1
+
+        answer = row["answer"]
+        return json.loads(answer) if isinstance(answer, str) else answer
+
+    @staticmethod
+    async def store(
+        query: str,
+        query_embedding: List[float],
+        document_ids: Optional[List[str]],
+        answer: Dict,
+        generation: Optional[str] = None,
+    ) -> None:
+        """Cache an answer for semantically equivalent queries; expired entries are pruned here.
+
+        generation is the index generation the answer was computed against; by default, the current one.
+        """
+        try:
+            if generation is None:
+                generation = await index_generation(document_ids)
+            await SemanticCache._insert(query, query_embedding, document_ids, answer, generation)
+        except Exception as e:
+            print(f"Semantic cache store failed: {e}")
+
+    @staticmethod
+    async def _insert(
+        query: str,
+        query_embedding: List[float],
+        document_ids: Optional[List[str]],
+        answer: Dict,
+        generation: str,
+    ) -> None:
+        async with database.transaction():
+            await database.execute("DELETE FROM semantic_cache WHERE expires_at <= NOW()")
+            await database.execute(
+                f"DELETE FROM semantic_cache_audit WHERE created_at < NOW() - INTERVAL '{AUDIT_RETENTION_DAYS} days'"
+            )
+            await database.execute(
+                """
+                INSERT INTO semantic_cache (scope_key, document_ids, query, query_embedding, answer, expires_at)
+                VALUES (
+                    :scope_key,
+                    CAST(:document_ids AS uuid[]),
+                    :query,
+                    CAST(:query_embedding AS vector),
+                    CAST(:answer AS jsonb),
+                    NOW() + make_interval(secs => :ttl)
+                )
+                """,
+                {
+                    "scope_key": SemanticCache.scope_key(document_ids, generation),
+                    "document_ids": [str(doc_id) for doc_id in document_ids] if document_ids else None,
+                    "query": query,
+                    "query_embedding": query_embedding,
+                    "answer": json.dumps(answer),
+                    "ttl": float(settings.QUERY_CACHE_TTL),
+                },
+            )
+
+    @staticmethod
+    async def invalidate_document(document_id: str) -> None:
+        """Drop answers built from this document, and answers scoped to all documents."""
+        try:
+            await database.execute(
+                """
+                DELETE FROM semantic_cache
+                WHERE document_ids IS NULL OR CAST(:document_id AS uuid) = ANY(document_ids)
+                """,
+                {"document_id": str(document_id)},
+            )
+        except Exception as e:
+            print(f"Semantic cache invalidation failed for {document_id}: {e}")
+
+    @staticmethod
+    async def recent_hits(limit: int = 50) -> List[Dict]:
+        rows = await database.fetch_all(
+            """
+            SELECT id, entry_id, query, cached_query, distance, false_hit, created_at
+            FROM semantic_cache_audit
+            ORDER BY created_at DESC
+            LIMIT :limit
+            """,
+            {"limit": limit},
+        )
+        return [
+            {
+                "id": str(row["id"]),
+                "entry_id": str(row["entry_id"]) if row["entry_id"] else None,
+                "query": row["query"],
+                "cached_query": row["cached_query"],
+                "distance": float(row["distance"]),
+                "false_hit": row["false_hit"],
+                "created_at": row["created_at"],
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    async def mark_false_hit(hit_id: str) -> bool:
+        """Record that a hit served the wrong answer and stop serving that entry."""
+        async with database.transaction():
+            row = await database.fetch_one(
+                """
+                UPDATE semantic_cache_audit SET false_hit = TRUE
+                WHERE id = :id
+                RETURNING entry_id
+                """,
+                {"id": hit_id},
+            )
+            if row is None:
+                return False
+            if row["entry_id"] is not None:
+                await database.execute("DELETE FROM semantic_cache WHERE id = :id", {"id": row["entry_id"]})
+        return True
+
+    @staticmethod
+    async def audit_summary() -> Dict:
+        row = await database.fetch_one(
+            """
+            SELECT COUNT(*) AS hits, COUNT(*) FILTER (WHERE false_hit) AS false_hits
+            FROM semantic_cache_audit
+            """
+        )
+        hits, false_hits = row["hits"], row["false_hits"]
+        return {
+            "audited_hits": hits,
+            "false_hits": false_hits,
+            "false_hit_ratio": round(false_hits / hits, 4) if hits else 0.0,
+        }
+
+    @staticmethod
+    def stats() -> Dict:
+        return {
+            "enabled": settings.SEMANTIC_CACHE_ENABLED,
+            "max_distance": settings.SEMANTIC_CACHE_MAX_DISTANCE,
+            "lookups": SemanticCache.lookups,
+            "hits": SemanticCache.hits,
+            "hit_ratio": round(SemanticCache.hits / SemanticCache.lookups, 4) if SemanticCache.lookups else 0.0,
+        }
@@ -0,0 +1,202 @@
+# backend/app/services/text_processing.py
+"""CPU-bound PDF extraction, cleaning and chunking.
+
+Everything here is plain functions over plain data so it can run inside
+ProcessPoolExecutor workers. Keep imports light: no settings, database or
+Redis, since each worker process imports this module on start-up.
+"""
+import io
+import itertools
+import mmap
+import re
+from functools import lru_cache
+from typing import Dict, List, Union
+
+import PyPDF2
+from PyPDF2.errors import PdfReadError
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_encoder() -> tiktoken.Encoding:
+    """Load the BPE tables on first use (they may be downloaded), not at import."""
+    return tiktoken.encoding_for_model("gpt-4")
+
+
+# A PDF's bytes, or the path of a PDF on disk (memory-mapped rather than read into RAM)
+PdfSource = Union[bytes, str]
+
+
+def _open_stream(source: PdfSource):
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    with open(source, "rb") as f:
+        # The mapping stays valid after the file is closed
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def check_pdf_structure(path: str) -> None:
+    """Cheap sanity check without parsing: PDF header at the start, startxref and %%EOF at the end."""
+    with open(path, "rb") as f:
+        head = f.read(1024)
+        f.seek(0, io.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 2048))
+        tail = f.read()
+
+    if b"%PDF-" not in head:
+        raise ValueError("The uploaded file is not a valid PDF")
+    if b"startxref" not in tail or b"%%EOF" not in tail:
+        raise ValueError("The uploaded PDF is truncated or damaged")
+
+
+def open_pdf(source: PdfSource) -> PyPDF2.PdfReader:
+    """Open a PDF, rejecting unreadable and password-protected files"""
+    stream = _open_stream(source)
+    try:
+        reader = PyPDF2.PdfReader(stream)
+    except (PdfReadError, ValueError, OSError) as exc:
+        raise ValueError("The uploaded file is not a readable PDF") from exc
+
+    if reader.is_encrypted:
+        try:
+            decrypt_result = reader.decrypt("")
+        except Exception as exc:
+            raise ValueError("Encrypted PDFs are not supported") from exc
+        if decrypt_result == 0:
+            raise ValueError("Encrypted PDFs are not supported")
+
+    return reader
+
+
+def count_pages(source: PdfSource) -> int:
+    return len(open_pdf(source).pages)
+
+
+def clean_text(raw_text: str) -> str:
+    """Remove noise from PDF text"""
+    # Remove excessive whitespace
+    text = re.sub(r'\s+', ' ', raw_text)
+
+    # Remove common PDF artifacts
+    text = re.sub(r'[^\x00-\x7F]+', ' ', text)  # Remove non-ASCII
+
+    # Remove page numbers and headers/footers (heuristic)
+    lines = text.split('\n')
+    filtered_lines = []
+    for i, line in enumerate(lines):
+        line = line.strip()
+        word_count = len(line.split())
+
+        # Skip likely headers/footers
+        if word_count < 3 and i < 2:
+            continue
+        if word_count < 3 and i > len(lines) - 3:
+            continue
+
+        filtered_lines.append(line)
+
+    text = ' '.join(filtered_lines)
+    return text.strip()
+
+
+# Bump when chunk_text produces different chunks for the same settings;
+# documents indexed under another version are rebuilt in the background.
+CHUNKER_VERSION = 1
+
+# A final window shorter than this is folded into the previous chunk
+MIN_CHUNK_TOKENS = 25
+_SENTENCE_ENDINGS = (b".", b"!", b"?")
+
+
+def _snap_to_sentence(token_bytes: List[bytes], start: int, end: int, floor: int) -> int:
+    """Move `end` back to just after the last sentence-ending token at or above `floor`."""
+    for index in range(end - 1, max(start, floor) - 1, -1):
+        if token_bytes[index].rstrip().endswith(_SENTENCE_ENDINGS):
+            return index + 1
+    return end
+
+
+def chunk_text(
+    text: str,
+    page_num: int,
+    chunk_size: int,
+    chunk_overlap: int,
+    snap_to_sentence: bool = False,
+) -> List[Dict]:
+    """Split text into windows of chunk_size tokens overlapping by chunk_overlap tokens
+
+    The page is tokenized once. Each chunk's text is sliced from the page at
+    its tokens' byte offsets, so token_count and char_count need no re-encoding.
+    """
+    encoder = get_encoder()
+    tokens = encoder.encode(text)
+    if not tokens:
+        return []
+
+    token_bytes = encoder.decode_tokens_bytes(tokens)
+    offsets = [0, *itertools.accumulate(map(len, token_bytes))]
+    data = text.encode("utf-8")
+    total = len(tokens)
+
+    windows = []
+    start = 0
+    while True:
+        end = min(start + chunk_size, total)
+        # Don't leave a tiny chunk at the end
+        if total - end < MIN_CHUNK_TOKENS:
+            end = total
+        elif snap_to_sentence:
+            end = _snap_to_sentence(token_bytes, start, end, start + chunk_size // 2)
+        windows.append((start, end))
+        if end >= total:
+            break
+        start = max(end - chunk_overlap, start + 1)
+
+    chunks = []
+    for chunk_index, (start, end) in enumerate(windows):
+        chunk = data[offsets[start]:offsets[end]].decode("utf-8", errors="ignore").strip()
+        chunks.append({
+            'chunk_index': chunk_index,
+            'text': chunk,
+            'page_number': page_num,
+            'char_count': len(chunk),
+            'token_count': end - start
+        })
+
+    return chunks
+
+
+def process_page_range(
+    source: PdfSource,
+    first_page: int,
+    last_page: int,
+    chunk_size: int,
+    chunk_overlap: int,
+    snap_to_sentence: bool = False,
+) -> List[Dict]:
+    """Extract, clean and chunk pages first_page..last_page (1-based, inclusive).
+
+    Returns one entry per page that has text, in page order. Pass a path so
+    each worker maps the file itself instead of receiving a pickled copy.
+    """
+    reader = open_pdf(source)
+    pages = []
+    for page_num in range(first_page, last_page + 1):
+        cleaned = clean_text(reader.pages[page_num - 1].extract_text() or "")
+        if not cleaned.strip():  # Skip empty pages
+            continue
+        pages.append({
+            'page_num': page_num,
+            'chunks': chunk_text(cleaned, page_num, chunk_size, chunk_overlap, snap_to_sentence),
+        })
+    return pages
+
+
+def split_page_ranges(page_count: int, pages_per_range: int) -> List[tuple]:
+    """Cut 1..page_count into contiguous (first, last) ranges."""
+    size = max(1, pages_per_range)
+    return [
+        (first, min(first + size - 1, page_count))
+        for first in range(1, page_count + 1, size)
+    ]
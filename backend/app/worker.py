@@ -0,0 +1,166 @@
+# app/worker.py
+"""Standalone ingestion worker.
+
+    python -m app.worker
+
+Claims jobs from the ingestion_jobs table and runs the document pipeline.
+Run as many worker processes, on as many nodes, as ingest load needs; they
+coordinate through row locks, so no other broker is required. Workers need
+read access to UPLOAD_DIR (a shared volume when running on several nodes).
+"""
+import asyncio
+import os
+import signal
+import socket
+import uuid
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.database import database
+from app.core import redis as redis_core
+from app.core import http_client as http_core
+from app.core import local_cache
+from app.core.executor import shutdown_process_pool
+from app.services.document_service import DocumentService
+from app.services.job_queue import JobQueue, job_available
+from app.services.reindexer import Reindexer
+from app.services.semantic_cache import SemanticCache
+
+
+async def _keep_lease(job: Dict, worker_id: str, job_task: asyncio.Task) -> None:
+    """Renew the lease while the job runs; cancel the job if the lease was lost."""
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+        try:
+            if not await JobQueue.heartbeat(job["id"], worker_id):
+                print(f"Lost lease on job {job['id']}; stopping it")
+                job_task.cancel()
+                return
+        except Exception as e:
+            print(f"Heartbeat failed for job {job['id']}: {e}")
+
+
+async def run_job(job: Dict, worker_id: str) -> None:
+    reindex = job["kind"] == "reindex"
+    if job["attempts"] > job["max_attempts"]:
+        # Reclaimed after its lease expired once too often (e.g. the worker kept crashing)
+        await JobQueue.fail(job, "Lease expired after final attempt")
+        if not reindex:
+            await database.execute(
+                "UPDATE documents SET processing_status = 'failed' WHERE id = :document_id",
+                {"document_id": job["document_id"]},
+            )
+        return
+
+    print(f"Worker {worker_id} running {job['kind']} job {job['id']} (attempt {job['attempts']}/{job['max_attempts']})")
+    job_task = asyncio.current_task()
+    lease_task = asyncio.create_task(_keep_lease(job, worker_id, job_task))
+
+    try:
+        await DocumentService.process_document(
+            job["file_path"], job["filename"], job["document_id"], reindex=reindex
+        )
+        await JobQueue.complete(job["id"])
+    except asyncio.CancelledError:
+        raise
+    except (ValueError, FileNotFoundError) as e:
+        # Unreadable, encrypted, empty or deleted PDF: retrying will not help
+        await JobQueue.fail(job, str(e), retry=False)
+        print(f"Job {job['id']} failed permanently: {e}")
+    except Exception as e:
+        delay = await JobQueue.fail(job, f"{type(e).__name__}: {e}")
+        if delay is None:
+            print(f"Job {job['id']} failed permanently")
+        else:
+            print(f"Job {job['id']} will retry in {delay:.0f}s")
+    finally:
+        lease_task.cancel()
+
+
+async def _reindex_loop(stop: asyncio.Event) -> None:
+    """Periodically queue documents whose chunks were built with older settings."""
+    while not stop.is_set():
+        try:
+            await Reindexer.enqueue_stale(settings.REINDEX_MAX_IN_FLIGHT)
+        except Exception as e:
+            print(f"Re-index scan failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.REINDEX_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(stop: asyncio.Event, concurrency: Optional[int] = None) -> None:
+    """Claim and run jobs until `stop` is set, with at most `concurrency` at once."""
+    concurrency = concurrency or settings.WORKER_CONCURRENCY
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    running = set()
+    print(f"Ingestion worker {worker_id} started (concurrency={concurrency})")
+    reindex_task = asyncio.create_task(_reindex_loop(stop)) if settings.REINDEX_ENABLED else None
+
+    while not stop.is_set():
+        free_slots = concurrency - len(running)
+        jobs = []
+        if free_slots > 0:
+            job_available.clear()
+            try:
+                jobs = await JobQueue.claim(worker_id, free_slots)
+            except Exception as e:
+                print(f"Worker {worker_id} could not claim jobs: {e}")
+
+        for job in jobs:
+            task = asyncio.create_task(run_job(job, worker_id))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        if jobs and len(running) < concurrency:
+            continue  # there may be more runnable work; claim again straight away
+
+        # Sleep until the poll interval passes, a job finishes, a local upload arrives, or we stop
+        waiters = [
+            asyncio.create_task(stop.wait()),
+            asyncio.create_task(job_available.wait()),
+            *running,
+        ]
+        await asyncio.wait(
+            waiters,
+            timeout=settings.WORKER_POLL_INTERVAL,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        for waiter in waiters[:2]:
+            waiter.cancel()
+
+    # Shutdown: give running jobs a grace period, then hand the rest back to the queue
+    if running:
+        _, still_running = await asyncio.wait(running, timeout=settings.WORKER_SHUTDOWN_GRACE)
+        for task in still_running:
+            task.cancel()
+        await asyncio.gather(*still_running, return_exceptions=True)
+    if reindex_task is not None:
+        await reindex_task
+    released = await JobQueue.release(worker_id)
+    print(f"Ingestion worker {worker_id} stopped ({released} jobs released)")
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await redis_core.init_redis()
+    await http_core.init_http_client()
+    await database.connect()
+    local_cache.add_change_hook(SemanticCache.invalidate_document)
+
+    try:
+        await run_worker(stop)
+    finally:
+        await database.disconnect()
+        await redis_core.close_redis()
+        await http_core.close_http_client()
+        shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
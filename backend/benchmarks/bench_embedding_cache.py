@@ -0,0 +1,50 @@
+"""Embedding cache value formats: size and encode/decode cost, JSON vs binary.
+
+    python -m benchmarks.bench_embedding_cache --dimension 768 --entries 2000
+
+No Redis needed; this times the serialization done on every cache read and
+write on the ingest and query paths.
+"""
+import argparse
+import json
+import random
+import time
+
+from app.core.redis import decode_embedding, encode_embedding
+
+
+def timed(fn, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items)
+
+
+def main(args) -> None:
+    rng = random.Random(7)
+    vectors = [[rng.uniform(-0.1, 0.1) for _ in range(args.dimension)] for _ in range(args.entries)]
+    formats = {
+        "json": (lambda values: json.dumps(values).encode(), lambda data: json.loads(data)),
+        "float32": (lambda values: encode_embedding(values, "float32"), decode_embedding),
+        "float16": (lambda values: encode_embedding(values, "float16"), decode_embedding),
+    }
+
+    print(f"{args.entries} embeddings x {args.dimension} dims")
+    baseline = None
+    for name, (encode, decode) in formats.items():
+        encoded = [encode(values) for values in vectors]
+        size = sum(map(len, encoded)) / len(encoded)
+        baseline = baseline or size
+        encode_us = timed(encode, vectors) * 1e6
+        decode_us = timed(decode, encoded) * 1e6
+        print(
+            f"{name:<8} {size / 1024:6.1f} KB/entry ({size / baseline:5.1%} of JSON)  "
+            f"encode {encode_us:7.1f}us  decode {decode_us:7.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--entries", type=int, default=2000)
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+"""PDF extraction throughput and event-loop lag: 1 worker vs N workers.
+
+    python -m benchmarks.bench_pdf_extraction --pages 200 --workers 4
+
+Pool workers are given the file path and map the PDF themselves, as in
+production. Also runs the extraction inline on the event loop (the old behaviour) and
+reports the worst loop stall seen by a 10ms ticker, which is what concurrent
+/query requests experience while a document is ingesting.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.services import text_processing
+from benchmarks.pdf_fixtures import make_pdf
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+
+async def measure_loop_lag(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - started - 0.01)
+    return worst
+
+
+async def run_pool(pdf: str, page_count: int, workers: int, pages_per_range: int) -> list:
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Warm the workers so process start-up is not counted
+        await asyncio.gather(*(loop.run_in_executor(pool, text_processing.count_pages, pdf) for _ in range(workers)))
+
+        ranges = text_processing.split_page_ranges(page_count, pages_per_range)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(
+                pool, text_processing.process_page_range, pdf, first, last, CHUNK_SIZE, CHUNK_OVERLAP
+            )
+            for first, last in ranges
+        ))
+        return [time.perf_counter() - started, sum(len(pages) for pages in results)]
+
+
+async def run_inline(pdf: bytes, page_count: int) -> list:
+    started = time.perf_counter()
+    pages = text_processing.process_page_range(pdf, 1, page_count, CHUNK_SIZE, CHUNK_OVERLAP)
+    return [time.perf_counter() - started, len(pages)]
+
+
+async def timed(label: str, work) -> None:
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    await asyncio.sleep(0.05)
+    elapsed, pages = await work
+    stop.set()
+    worst_lag = await lag_task
+    print(f"{label:<12} {pages} pages in {elapsed:6.2f}s  {pages / elapsed:8.1f} pages/sec  worst loop stall {worst_lag * 1000:7.1f}ms")
+
+
+async def main(args) -> None:
+    pdf = make_pdf(args.pages)
+    print(f"synthetic PDF: {args.pages} pages, {len(pdf) / 1024:.0f} KB")
+
+    await timed("inline", run_inline(pdf, args.pages))
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+        f.write(pdf)
+        f.flush()
+        await timed("1 worker", run_pool(f.name, args.pages, 1, args.pages_per_range))
+        await timed(f"{args.workers} workers", run_pool(f.name, args.pages, args.workers, args.pages_per_range))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--pages-per-range", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,132 @@
+"""Recall, latency and index size: full vector HNSW vs halfvec and binary shortlists.
+
+    python -m benchmarks.bench_vector_index --rows 20000 --queries 200 --rescore-factor 10
+
+Needs Postgres with pgvector >= 0.7 at DATABASE_URL. Loads clustered random
+vectors into a scratch table (bench_vectors, dropped afterwards), then builds
+each index in turn and runs the same query shapes as
+QueryService.build_search_query. Recall@k is measured against an exact
+sequential scan.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.database import _init_connection
+
+TABLE = "bench_vectors"
+
+
+def make_vectors(rows: int, dimension: int, clusters: int, seed: int) -> list:
+    """Unit vectors around a few centroids, which is roughly how text embeddings sit."""
+    rng = random.Random(seed)
+    centroids = [[rng.gauss(0, 1) for _ in range(dimension)] for _ in range(clusters)]
+    vectors = []
+    for _ in range(rows):
+        centroid = rng.choice(centroids)
+        vector = [value + rng.gauss(0, 0.6) for value in centroid]
+        norm = sum(value * value for value in vector) ** 0.5
+        vectors.append([value / norm for value in vector])
+    return vectors
+
+
+def index_sql(mode: str, dimension: int) -> str:
+    definition = {
+        "vector": "embedding vector_cosine_ops",
+        "halfvec": f"(embedding::halfvec({dimension})) halfvec_cosine_ops",
+        "binary": f"(binary_quantize(embedding)::bit({dimension})) bit_hamming_ops",
+    }[mode]
+    return f"CREATE INDEX bench_vectors_{mode} ON {TABLE} USING hnsw ({definition}) WITH (m = 16, ef_construction = 64)"
+
+
+def search_sql(mode: str, dimension: int) -> str:
+    if mode in ("exact", "vector"):
+        return f"SELECT id FROM {TABLE} ORDER BY embedding <=> $1 LIMIT $2"
+
+    compact = {
+        "halfvec": f"embedding::halfvec({dimension}) <=> $1::vector::halfvec({dimension})",
+        "binary": f"binary_quantize(embedding)::bit({dimension}) <~> binary_quantize($1::vector)::bit({dimension})",
+    }[mode]
+    return f"""
+        SELECT id FROM (
+            SELECT id, embedding FROM {TABLE} ORDER BY {compact} LIMIT $3
+        ) shortlist
+        ORDER BY embedding <=> $1::vector
+        LIMIT $2
+    """
+
+
+async def run_queries(conn, mode: str, queries: list, k: int, rescore_factor: int, dimension: int) -> tuple:
+    sql = search_sql(mode, dimension)
+    shortlist = k * rescore_factor
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        async with conn.transaction():
+            if mode == "exact":
+                await conn.execute("SET LOCAL enable_indexscan = off")
+            else:
+                await conn.execute(f"SET LOCAL hnsw.ef_search = {min(max(shortlist, 40), 1000)}")
+            args = (query, k) if mode in ("exact", "vector") else (query, k, shortlist)
+            rows = await conn.fetch(sql, *args)
+        latencies.append(time.perf_counter() - started)
+        results.append([row["id"] for row in rows])
+    return results, latencies
+
+
+async def main(args) -> None:
+    dimension = args.dimension
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        await _init_connection(conn)
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.execute(f"CREATE TABLE {TABLE} (id INTEGER PRIMARY KEY, embedding vector({dimension}))")
+
+        vectors = make_vectors(args.rows + args.queries, dimension, args.clusters, args.seed)
+        corpus, queries = vectors[:args.rows], vectors[args.rows:]
+        await conn.copy_records_to_table(TABLE, records=list(enumerate(corpus)), columns=["id", "embedding"])
+        await conn.execute(f"ANALYZE {TABLE}")
+        print(f"{args.rows} rows x {dimension} dims, {args.queries} queries, k={args.k}, rescore x{args.rescore_factor}")
+
+        truth, exact_latencies = await run_queries(conn, "exact", queries, args.k, 1, dimension)
+        print(f"{'exact scan':<10} recall 1.000  p50 {statistics.median(exact_latencies) * 1000:7.2f}ms")
+
+        for mode in ("vector", "halfvec", "binary"):
+            started = time.perf_counter()
+            await conn.execute(index_sql(mode, dimension))
+            build_seconds = time.perf_counter() - started
+            size = await conn.fetchval(f"SELECT pg_relation_size('bench_vectors_{mode}')")
+
+            results, latencies = await run_queries(conn, mode, queries, args.k, args.rescore_factor, dimension)
+            recall = statistics.mean(
+                len(set(found) & set(expected)) / len(expected)
+                for found, expected in zip(results, truth)
+            )
+            latencies.sort()
+            print(
+                f"{mode:<10} recall {recall:.3f}  p50 {statistics.median(latencies) * 1000:7.2f}ms  "
+                f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.2f}ms  "
+                f"index {size / 1024 / 1024:7.1f} MB  built in {build_seconds:5.1f}s"
+            )
+            await conn.execute(f"DROP INDEX bench_vectors_{mode}")
+    finally:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,50 @@
+"""Synthetic text PDFs for benchmarks, written by hand so no PDF library is needed."""
+import random
+
+_WORDS = (
+    "policy refund invoice customer account service quarterly revenue contract "
+    "employee handbook security incident report compliance section clause term "
+    "payment schedule delivery warranty support escalation procedure approval"
+).split()
+
+
+def make_pdf(pages: int, lines_per_page: int = 45, words_per_line: int = 12, seed: int = 7) -> bytes:
+    """Return a valid PDF with `pages` pages of pseudo-random English-like text."""
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+
+    for page_num in range(1, pages + 1):
+        lines = [
+            " ".join(rng.choice(_WORDS) for _ in range(words_per_line)).capitalize() + "."
+            for _ in range(lines_per_page)
+        ]
+        text_ops = "\n".join(f"({line}) '" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 780 Td\n(Page {page_num}) Tj\n{text_ops}\nET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+
+    kids = b" ".join(b"%d 0 R" % ref for ref in page_refs)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
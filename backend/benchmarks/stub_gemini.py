@@ -0,0 +1,145 @@
+"""Local stand-in for the Gemini REST API, for offline tests and benchmarks.
+
+Embeddings are deterministic (seeded from the text) so repeated runs compare
+like for like. generateContent / streamGenerateContent return a fixed answer
+citing the first source. Latency and a requests-per-minute quota can be configured to
+exercise batching, concurrency and 429 handling.
+
+Run standalone and point the backend at it:
+
+    python -m benchmarks.stub_gemini --port 8089 --latency-ms 150 --rpm 300
+    GEMINI_API_BASE_URL=http://127.0.0.1:8089 uvicorn app.main:app
+
+Or mount it in-process with ``httpx.ASGITransport(app=create_app(...))``.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import deque
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def fake_embedding(text: str, dimension: int) -> list:
+    """Unit-length pseudo-random vector derived from the text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    values = [rng.gauss(0.0, 1.0) for _ in range(dimension)]
+    norm = sum(value * value for value in values) ** 0.5 or 1.0
+    return [value / norm for value in values]
+
+
+def create_app(latency_ms: float = 0.0, requests_per_minute: int = 0) -> FastAPI:
+    """Build the stub. requests_per_minute=0 disables the quota."""
+    app = FastAPI(title="Gemini stub")
+    app.state.calls = {
+        "embedContent": 0,
+        "batchEmbedContents": 0,
+        "generateContent": 0,
+        "streamGenerateContent": 0,
+        "rate_limited": 0,
+    }
+    # Requests being served at once, and the most seen; shows how much concurrency callers achieve
+    app.state.concurrency = {"current": 0, "peak": 0}
+    window = deque()
+
+    def over_quota() -> bool:
+        if not requests_per_minute:
+            return False
+        now = time.monotonic()
+        while window and now - window[0] > 60:
+            window.popleft()
+        if len(window) >= requests_per_minute:
+            return True
+        window.append(now)
+        return False
+
+    def rate_limited_response() -> JSONResponse:
+        app.state.calls["rate_limited"] += 1
+        retry_after = max(1, int(60 - (time.monotonic() - window[0])))
+        return JSONResponse(
+            {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+            status_code=429,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    def embed_request(body: dict) -> dict:
+        text = "".join(part.get("text", "") for part in body["content"]["parts"])
+        dimension = int(body.get("outputDimensionality") or 768)
+        return {"values": fake_embedding(text, dimension)}
+
+    def answer_text(body: dict) -> str:
+        """Cites the first source; JSON when the caller asked for JSON."""
+        config = body.get("generationConfig") or {}
+        if config.get("responseMimeType") == "application/json":
+            return json.dumps({"answer": "Stub answer [SOURCE 1].", "has_answer": True, "citations": [1]})
+        return "Stub answer from the first source [SOURCE 1]."
+
+    def candidate(text: str) -> dict:
+        return {
+            "candidates": [
+                {"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}
+            ]
+        }
+
+    async def stream_response(body: dict):
+        """The answer in a few SSE chunks, with the latency spread across them."""
+        words = answer_text(body).split(" ")
+        pieces = [" ".join(words[i:i + 3]) + " " for i in range(0, len(words), 3)]
+        concurrency = app.state.concurrency
+        concurrency["current"] += 1
+        concurrency["peak"] = max(concurrency["peak"], concurrency["current"])
+        try:
+            for piece in pieces:
+                if latency_ms:
+                    await asyncio.sleep(latency_ms / 1000 / len(pieces))
+                yield f"data: {json.dumps(candidate(piece))}\r\n\r\n"
+        finally:
+            concurrency["current"] -= 1
+
+    @app.post("/v1beta/models/{model_action}")
+    async def model_action(model_action: str, request: Request):
+        _, _, action = model_action.partition(":")
+        if action not in app.state.calls:
+            raise HTTPException(404, f"Unsupported action: {action}")
+        if over_quota():
+            return rate_limited_response()
+
+        app.state.calls[action] += 1
+        body = await request.json()
+        if action == "streamGenerateContent":
+            return StreamingResponse(stream_response(body), media_type="text/event-stream")
+
+        concurrency = app.state.concurrency
+        concurrency["current"] += 1
+        concurrency["peak"] = max(concurrency["peak"], concurrency["current"])
+        try:
+            if latency_ms:
+                await asyncio.sleep(latency_ms / 1000)
+        finally:
+            concurrency["current"] -= 1
+
+        if action == "embedContent":
+            return {"embedding": embed_request(body)}
+        if action == "generateContent":
+            return candidate(answer_text(body))
+        return {"embeddings": [embed_request(item) for item in body["requests"]]}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute before 429s (0 = unlimited)")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.latency_ms, args.rpm), host=args.host, port=args.port)
@@ -0,0 +1,51 @@
+"""In-memory stand-in for the redis.asyncio commands the app uses, shared by the tests."""
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, nx=False):
+        self.commands.append((key, value, nx))
+
+    def setex(self, key, ttl, value):
+        self.commands.append((key, value, False))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        return [self.redis._store(key, value, nx) for key, value, nx in self.commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.published = []
+        self.round_trips = 0
+
+    def _store(self, key, value, nx):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, nx=False):
+        self.round_trips += 1
+        return self._store(key, value, nx)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def publish(self, channel, message):
+        self.round_trips += 1
+        self.published.append((channel, message))
@@ -6,7 +6,7 @@ export default function ChatInput({ onSendQuery, isLoading }) {
     const [query, setQuery] = useState('');
     const { documents } = useDocuments();
 
-    const readyCount = documents.filter(doc => doc.status === 'completed').length;
+    const readyCount = documents.filter(doc => ['completed', 'partial'].includes(doc.status)).length;
     const isDisabled = isLoading || readyCount === 0;
 
     const handleSubmit = () => {
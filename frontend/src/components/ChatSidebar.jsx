@@ -1,9 +1,12 @@
 import { CheckCircle2, Circle, Files } from 'lucide-react';
 import { useDocuments } from '../hooks/useDocuments';
 
+// Partially indexed documents can already be searched.
+const SEARCHABLE_STATUSES = ['completed', 'partial'];
+
 export default function ChatSidebar() {
     const { documents, selectedDocumentIds, setSelectedDocuments, toggleDocumentSelection } = useDocuments();
-    const readyDocuments = documents.filter(doc => doc.status === 'completed');
+    const readyDocuments = documents.filter(doc => SEARCHABLE_STATUSES.includes(doc.status));
 
     return (
         <aside className="col-span-1 overflow-y-auto rounded-lg border border-slate-200 bg-white shadow-sm">
@@ -30,7 +33,7 @@ export default function ChatSidebar() {
                 </button>
 
                 {documents.map(doc => {
-                    const isReady = doc.status === 'completed';
+                    const isReady = SEARCHABLE_STATUSES.includes(doc.status);
                     const isSelected = selectedDocumentIds.includes(doc.id);
 
                     return (
@@ -3,6 +3,8 @@ import { AlertTriangle, CheckCircle2, Clock3, FileText, RefreshCw, Trash2 } from
 import { documentApi } from '../services/api';
 import { useDocuments } from '../hooks/useDocuments';
 
+const IN_PROGRESS_STATUSES = ['processing', 'partial'];
+
 const statusMeta = {
     completed: {
         icon: CheckCircle2,
@@ -14,6 +16,11 @@ const statusMeta = {
         className: 'bg-amber-50 text-amber-700 border-amber-200',
         label: 'Processing',
     },
+    partial: {
+        icon: Clock3,
+        className: 'bg-sky-50 text-sky-700 border-sky-200',
+        label: 'Indexing',
+    },
     failed: {
         icon: AlertTriangle,
         className: 'bg-rose-50 text-rose-700 border-rose-200',
@@ -28,7 +35,7 @@ export default function DocumentList() {
     const [error, setError] = useState(null);
 
     const hasProcessingDocs = useMemo(
-        () => documents.some(doc => doc.status === 'processing'),
+        () => documents.some(doc => IN_PROGRESS_STATUSES.includes(doc.status)),
         [documents],
     );
 
@@ -54,7 +61,7 @@ export default function DocumentList() {
         if (!hasProcessingDocs) return undefined;
 
         const intervalId = window.setInterval(async () => {
-            const processingDocs = documents.filter(doc => doc.status === 'processing');
+            const processingDocs = documents.filter(doc => IN_PROGRESS_STATUSES.includes(doc.status));
             await Promise.all(processingDocs.map(async (doc) => {
                 try {
                     const latest = await documentApi.getById(doc.id);
@@ -128,7 +135,7 @@ export default function DocumentList() {
                                     <div className="min-w-0">
                                         <h3 className="truncate font-medium text-slate-950">{doc.title}</h3>
                                         <p className="mt-1 text-sm text-slate-500">
-                                            {doc.pageCount} pages - {doc.chunkCount} chunks
+                                            {doc.pageCount ? `${doc.pageCount} pages` : 'Counting pages'} - {doc.chunkCount} chunks
                                         </p>
                                     </div>
                                 </div>